@@ -0,0 +1,256 @@
+# --- JSON API (rovnaký engine a teplá cache ako Streamlit UI, bez rerunu skriptu) ---
+# GET /query?q=STATUS+ABC123   (Authorization: Bearer <token> alebo X-API-Token: <token>)
+# GET /query?q=TRADELIST&page=1&page_size=100&sort=Account&desc=1&filter=EUR&columns=Account,Instrument
+# GET /query?q=STATUS+ABC123&source=acme   (jeden zdroj zo SOURCES; source=* = všetky naraz)
+# GET /suggest?q=ACCOUNT+147572&limit=10   (prefixové návrhy kľúčov pri písaní)
+# GET /export?sheet=TRADELIST&format=parquet   (celý list, stream po blokoch; TRADELIST alebo CLIENTACCOUNT)
+# GET /export?q=ACCOUNT+147572&format=csv        (výsledok dotazu; pri VIEW aj &sheet=ACCOUNT)
+# GET /watch?since=12          (watchlist + zmeny STATUS s id > since)
+# POST /watch {"add": ["REF1"], "remove": ["REF2"], "source": "acme"}
+# GET /metrics                 (Prometheus text s časmi fáz)
+# GET /ready                   (200 po warmupe, inak 503; pre load balancer, bez tokenu)
+import hmac, json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+import engine
+from engine import log
+
+API_HOST = engine.load_setting("API_HOST", "0.0.0.0")
+# 0 = API sa v Streamlit procese nespúšťa; `python api.py` použije 8502
+API_PORT = engine.load_setting("API_PORT", 0)
+# token pre API; prázdny = rovnaké heslo ako UI (a bez hesla dev mód)
+API_TOKEN = engine.load_setting("API_TOKEN", "") or engine.load_setting("APP_PASSWORD", "")
+
+def _records(df: pd.DataFrame) -> list:
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def result_to_json(res: dict) -> dict:
+    out = {k: res[k] for k in ("query", "kind", "sheet", "ok", "message", "value", "page", "version", "source")}
+    out["rows"] = _records(res["rows"]) if res["rows"] is not None else []
+    if res["sections"] is not None:
+        out["sections"] = {sheet: _records(df) for sheet, df in res["sections"].items()}
+    return out
+
+def _tradelist_options(params: dict) -> dict:
+    # ?page=2&page_size=100&sort=Account&desc=1&filter=EUR&columns=Account,Instrument
+    one = lambda k, d: params.get(k, [d])[0]
+    return {
+        "page": int(one("page", 1)),
+        "page_size": int(one("page_size", engine.TRADELIST_PAGE_SIZE)),
+        "sort_by": one("sort", None),
+        "descending": one("desc", "0").lower() in ("1", "true", "yes"),
+        "filter_text": one("filter", "").strip(),
+        "columns": [c for c in one("columns", "").split(",") if c],
+    }
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive pre klientov s poolom
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            self._send(200, engine.metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+            return
+        if url.path == "/ready":
+            ready = engine.readiness()
+            self._send_json(200 if ready["ready"] else 503, ready)
+            return
+        if url.path == "/watch":
+            if self._authorized():
+                self._send_watch(parse_qs(url.query))
+            else:
+                self._send_json(401, {"error": "unauthorized"})
+            return
+        if url.path not in ("/query", "/suggest", "/export"):
+            self._send_json(404, {"error": "not found"})
+            return
+        if not self._authorized():
+            self._send_json(401, {"error": "unauthorized"})
+            return
+        params = parse_qs(url.query)
+        q = params.get("q", [""])[0]
+        if url.path == "/export" and not q.strip():
+            self._export_sheet(params)
+            return
+        if not q.strip():
+            self._send_json(400, {"error": "missing query parameter 'q'"})
+            return
+        source = params.get("source", [None])[0]
+        if source not in (None, "*") and source not in engine.source_names():
+            self._send_json(404, {"error": f"unknown source '{source}'"})
+            return
+        if url.path == "/suggest":
+            self._suggest(q, params, None if source == "*" else source)
+            return
+        try:
+            opts = _tradelist_options(params)
+        except ValueError:
+            self._send_json(400, {"error": "invalid paging parameters"})
+            return
+        if source == "*":
+            if url.path == "/export":
+                self._send_json(400, {"error": "export needs a single source"})
+                return
+            self._query_all(q, opts)
+            return
+        try:
+            res = engine.run_query(q, source=source, **opts)
+        except Exception:
+            log.warning("api query failed", exc_info=True)
+            self._send_json(503, {"error": "workbook unavailable"})
+            return
+        status = 200 if res["ok"] else (400 if res["kind"] is None else 404)
+        if url.path == "/export" and res["ok"]:
+            frames = engine.export_frames(res)
+            sheet = params.get("sheet", [next(iter(frames))])[0]
+            if sheet not in frames:
+                self._send_json(404, {"error": f"no '{sheet}' section in the result"})
+                return
+            self._send_export(frames[sheet], params, f"{res['kind']}_{res['sheet'] or sheet}")
+            return
+        self._send_json(status, result_to_json(res))
+
+    def _export_sheet(self, params: dict):
+        wanted = params.get("sheet", [""])[0].strip().upper()
+        if wanted not in engine.EXPORT_SHEETS:
+            self._send_json(400, {"error": "sheet must be one of " + ", ".join(engine.EXPORT_SHEETS)})
+            return
+        source = params.get("source", [None])[0]
+        try:
+            df = engine.get_sheet_by_name(engine.load_excel(source), wanted)
+        except KeyError:
+            self._send_json(404, {"error": f"unknown source '{source}'"})
+            return
+        except Exception:
+            log.warning("api export failed", exc_info=True)
+            self._send_json(503, {"error": "workbook unavailable"})
+            return
+        if df is None:
+            self._send_json(404, {"error": f"sheet '{wanted}' not found"})
+            return
+        self._send_export(df, params, wanted)
+
+    def _send_export(self, df: pd.DataFrame, params: dict, name: str):
+        fmt = params.get("format", ["csv"])[0].lower()
+        if fmt not in engine.EXPORT_FORMATS:
+            self._send_json(400, {"error": "format must be one of " + ", ".join(engine.EXPORT_FORMATS)})
+            return
+        # chunked transfer: v pamäti je len jeden blok, ostatné sessions nečakajú
+        self.send_response(200)
+        self.send_header("Content-Type", engine.EXPORT_FORMATS[fmt])
+        self.send_header("Content-Disposition", f'attachment; filename="{name.replace("/", "_")}.{fmt}"')
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        with engine.timed("render", query="EXPORT", format=fmt, rows=len(df)):
+            for chunk in engine.iter_export(df, fmt):
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/watch":
+            self._send_json(404, {"error": "not found"})
+            return
+        if not self._authorized():
+            self._send_json(401, {"error": "unauthorized"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            add, remove = body.get("add", []), body.get("remove", [])
+        except (ValueError, TypeError, AttributeError):
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+        # "add": "REF1" by list() rozsekal na znaky -> len zoznam reťazcov
+        if not all(isinstance(refs, list) and all(isinstance(r, str) for r in refs) for refs in (add, remove)):
+            self._send_json(400, {"error": "'add' and 'remove' must be lists of strings"})
+            return
+        source = body.get("source")
+        try:
+            if add:
+                engine.watch_add(add, source)
+            if remove:
+                engine.watch_remove(remove, source)
+        except KeyError:
+            self._send_json(404, {"error": f"unknown source '{source}'"})
+            return
+        self._send_watch({})
+
+    def _send_watch(self, params: dict):
+        try:
+            since = int(params.get("since", [0])[0])
+        except ValueError:
+            self._send_json(400, {"error": "invalid since"})
+            return
+        self._send_json(200, {"watchlist": engine.watchlist(), "feed": engine.watch_feed(since)})
+
+    def _query_all(self, q: str, opts: dict):
+        # výsledok per zdroj; nedostupný zdroj je len položka s ok=false
+        results = engine.run_query_all(q, **opts)
+        if results and results[0]["kind"] is None:
+            status = 400
+        else:
+            status = 200 if any(r["ok"] for r in results) else 404
+        self._send_json(status, {"query": q, "results": [result_to_json(r) for r in results]})
+
+    def _suggest(self, q: str, params: dict, source: str | None):
+        try:
+            limit = int(params.get("limit", [0])[0]) or None
+        except ValueError:
+            self._send_json(400, {"error": "invalid limit"})
+            return
+        try:
+            res = engine.suggest(q, limit=limit, source=source)
+        except Exception:
+            log.warning("api suggest failed", exc_info=True)
+            self._send_json(503, {"error": "workbook unavailable"})
+            return
+        self._send_json(200 if res["kind"] is not None else 400, res)
+
+    def _authorized(self) -> bool:
+        if not API_TOKEN:
+            return True  # dev mód bez hesla, ako v UI
+        auth = self.headers.get("Authorization", "")
+        token = auth[len("Bearer "):] if auth.startswith("Bearer ") else self.headers.get("X-API-Token", "")
+        return hmac.compare_digest(token.encode("utf-8"), API_TOKEN.encode("utf-8"))
+
+    def _send_json(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("api %s", format % args)
+
+def make_server(host: str = API_HOST, port: int = API_PORT) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    return server
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_in_background(port: int | None = None) -> ThreadingHTTPServer | None:
+    # volá sa pri každom rerune Streamlit skriptu -> server sa štartuje len raz na proces
+    global _server
+    port = API_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = make_server(API_HOST, port)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            log.info(json.dumps({"event": "api_started", "host": API_HOST, "port": port}))
+    return _server
+
+if __name__ == "__main__":
+    engine.start_warmup()  # /ready vráti 200 až po načítaní workbooku
+    server = make_server(API_HOST, API_PORT or 8502)
+    log.info(json.dumps({"event": "api_started", "host": API_HOST, "port": server.server_port}))
+    server.serve_forever()
@@ -1,11 +1,24 @@
-import os, io, time, random, requests
-from requests.exceptions import SSLError
+import os
+from functools import partial
 import pandas as pd
 import streamlit as st
+import api
+import engine
+from engine import (
+    change_summary, export_bytes, export_frames, get_sheet_by_name, load_excel, load_workbooks, memory_report, metrics_text, parse_query,
+    read_batch_lines, resolve_batch, result_cache_stats, run_query, source_names, source_status, stage_summary, suggest,
+    timed, watch_add, watch_feed, watch_remove, watchlist,
+)
 
 # --- PAGE CONFIG (musí byť ako prvý streamlit príkaz) ---
 st.set_page_config(page_title="B2B | SAXO CONNECTION", layout="wide", page_icon="Saxo-Capital-Markets.png")
 
+# --- WARMUP (workbook sa načíta na pozadí už počas prihlasovania) ---
+engine.start_warmup()
+
+# --- JSON API (voliteľne v tom istom procese -> rovnaká teplá cache) ---
+api.start_in_background()
+
 # --- PASSWORD GATE ---
 def _load_password():
     try:
@@ -35,14 +48,11 @@ def require_password():
 require_password()
 
 # --- CONFIGURATION ---
-def _load_excel_url():
-    try:
-        return st.secrets["EXCEL_URL"]  # Render → Environment (odporúčané)
-    except Exception:
-        return os.getenv("EXCEL_URL", "https://data.saxoconnection.com/FIX_API_CT147572INET.xlsx")
-
-EXCEL_URL = _load_excel_url()
 LOGO_PATH = "Saxo-Capital-Markets.png"
+# panel s časmi fáz (fetch/parse/index/lookup/render) pod výsledkom
+DEBUG_PANEL = engine.load_setting("DEBUG_PANEL", False)
+# ako často sa feed watchlistu obnovuje (s); obnova číta len pamäť, dotazy sa neopakujú
+WATCH_REFRESH = engine.load_setting("WATCH_REFRESH", 30.0)
 
 # --- HEADER ---
 st.image(LOGO_PATH, width=150)
@@ -50,139 +60,223 @@ st.title("B2B.SAXO.CONNECTION")
 st.caption("Secure data viewer for banking & account structure")
 
 # --- INPUT ---
-query = st.text_input("Enter your query (e.g. STATUS ABC123, CLIENT/ACCOUNT 147572INET/C...) ")
+# pri viacerých zdrojoch (SOURCES) výber protistrany alebo všetkých naraz
+ALL_SOURCES = "All sources"
+SOURCE_OPTIONS = source_names()
+source = st.selectbox("Source", SOURCE_OPTIONS + [ALL_SOURCES], key="source") if len(SOURCE_OPTIONS) > 1 else SOURCE_OPTIONS[0]
+query = st.text_input("Enter your query (e.g. STATUS ABC123, CLIENT/ACCOUNT 147572INET/C..., VIEW <client>) ", key="query")
+with st.expander("Batch mode"):
+    batch_text = st.text_area("One query per line (STATUS …, ACCOUNT …, CLIENT …, CLIENT/ACCOUNT …)")
+    batch_file = st.file_uploader("…or upload a CSV with one query per row", type=["csv", "txt"])
+    run_batch = st.button("Run batch")
+export_panel = st.expander("Export full sheets")  # obsah plní render_sheet_exports() v RUN
 
-# --- NETWORK HELPER (HTTPS -> HTTP fallback pri self-signed) ---
-def _fetch_bytes(url: str) -> bytes:
-    try:
-        r = requests.get(url, timeout=20)  # verify=True default
-        r.raise_for_status()
-        return r.content
-    except SSLError:
-        if url.startswith("https://"):
-            alt = "http://" + url[len("https://"):]
-            r = requests.get(alt, timeout=20)
-            r.raise_for_status()
-            return r.content
-        raise
-
-# --- DATA LOADER (čistí Unnamed stĺpce) ---
-@st.cache_data(ttl=300)
-def load_excel():
-    content = _fetch_bytes(EXCEL_URL)
-    xls = pd.ExcelFile(io.BytesIO(content), engine="openpyxl")
-    sheets = {}
-    for name in xls.sheet_names:
-        df = xls.parse(name, dtype=str)
-        df = df.loc[:, ~df.columns.astype(str).str.startswith("Unnamed")]
-        sheets[name] = df
-    return sheets
-
-def get_sheet_by_name(sheets: dict, wanted: str):
-    w = wanted.strip().upper()
-    for name, df in sheets.items():
-        if name.strip().upper() == w:
-            return df
-    return None
-
-# --- UX: simulované načítanie (aby bol feedback) ---
-def simulated_loading():
-    duration = random.randint(4, 10)
-    with st.spinner(f"Loading data... Please wait up to {duration} seconds..."):
-        time.sleep(duration)
-
-# --- MAIN LOGIC (presné routovanie na listy) ---
-def handle_query(query: str):
-    sheets = load_excel()
-    q = query.strip()
-
-    # STATUS -> len STATUS
-    if q.startswith("STATUS "):
-        ref = q.replace("STATUS ", "", 1).strip()
-        df = get_sheet_by_name(sheets, "STATUS")
-        if df is None:
-            st.error("Sheet 'STATUS' not found.")
-            return
-        if "Reference" in df.columns and "Status" in df.columns:
-            row = df[df["Reference"] == ref]
-            if not row.empty:
-                st.success(row.iloc[0]["Status"])
-                return
-        st.error("No matching reference found in 'STATUS'.")
-        return
+# --- MAIN LOGIC (dáta z engine, tu sa len renderuje) ---
+def export_buttons(res: dict):
+    # CSV/Parquet každého výsledku; bajty sa generujú až po kliknutí
+    for name, df in export_frames(res).items():
+        cols = st.columns([1, 1, 4])
+        for col, fmt in zip(cols, engine.EXPORT_FORMATS):
+            col.download_button(
+                f"{name} · {fmt.upper()}", partial(export_bytes, df, fmt), f"{res['kind']}_{name}.{fmt}".replace("/", "_"),
+                engine.EXPORT_FORMATS[fmt], key=f"export_{res['source']}_{name}_{fmt}", on_click="ignore",
+            )
 
-    # ACCOUNT -> len ACCOUNT
-    if q.startswith("ACCOUNT "):
-        val = q.replace("ACCOUNT ", "", 1).strip()
-        df = get_sheet_by_name(sheets, "ACCOUNT")
-        if df is None:
-            st.error("Sheet 'ACCOUNT' not found.")
-            return
-        if "Account" in df.columns:
-            row = df[df["Account"] == val]
-            if row.empty:
-                row = df[df.apply(lambda x: val in x.values, axis=1)]
-        else:
-            row = df[df.apply(lambda x: val in x.values, axis=1)]
-        if not row.empty:
-            st.dataframe(row, use_container_width=True)
-        else:
-            st.error("No matching account in 'ACCOUNT'.")
-        return
+def sheet_export(name: str, sheet: str, fmt: str) -> bytes:
+    df = get_sheet_by_name(load_excel(name), sheet)
+    return export_bytes(df if df is not None else pd.DataFrame(), fmt)
 
-    # CLIENT/ACCOUNT -> len CLIENTACCOUNT
-    if q.startswith("CLIENT/ACCOUNT "):
-        val = q.replace("CLIENT/ACCOUNT ", "", 1).strip()
-        df = get_sheet_by_name(sheets, "CLIENTACCOUNT")
-        if df is None:
-            st.error("Sheet 'CLIENTACCOUNT' not found.")
-            return
-        if "Account" in df.columns:
-            row = df[df["Account"] == val]
-            if row.empty:
-                row = df[df.apply(lambda x: val in x.values, axis=1)]
-        else:
-            row = df[df.apply(lambda x: val in x.values, axis=1)]
-        if not row.empty:
-            st.dataframe(row, use_container_width=True)
-        else:
-            st.error("No matching account info in 'CLIENTACCOUNT'.")
-        return
+def render_sheet_exports():
+    # listy sa načítajú a zakódujú až po kliknutí, na vlastnom vlákne (nebrzdí skript ani iné sessions)
+    for name in (SOURCE_OPTIONS if source == ALL_SOURCES else [source]):
+        for sheet in engine.EXPORT_SHEETS:
+            label = f"{name} · {sheet}" if len(SOURCE_OPTIONS) > 1 else sheet
+            c1, c2, c3 = st.columns([2, 1, 1])
+            c1.write(label)
+            for col, fmt in zip((c2, c3), engine.EXPORT_FORMATS):
+                col.download_button(
+                    f"Download {fmt.upper()}", partial(sheet_export, name, sheet, fmt), f"{sheet}.{fmt}",
+                    engine.EXPORT_FORMATS[fmt], key=f"export_sheet_{name}_{sheet}_{fmt}", on_click="ignore",
+                )
 
-    # CLIENT -> len CLIENT
-    if q.startswith("CLIENT "):
-        val = q.replace("CLIENT ", "", 1).strip()
-        df = get_sheet_by_name(sheets, "CLIENT")
-        if df is None:
-            st.error("Sheet 'CLIENT' not found.")
-            return
-        key_cols = [c for c in ["Client ID", "ClientID", "Client"] if c in df.columns]
-        if key_cols:
-            row = pd.concat([df[df[c] == val] for c in key_cols], axis=0)
-        else:
-            row = df[df.apply(lambda x: val in x.values, axis=1)]
-        if not row.empty:
-            st.dataframe(row, use_container_width=True)
+def render_result(res: dict):
+    if res["kind"] is None:
+        st.warning(res["message"])
+        return
+    if not res["ok"]:
+        st.error(res["message"])
+        return
+    with timed("render", query=res["kind"]):
+        if res["kind"] == "STATUS":
+            st.success(res["value"])
+        elif res["kind"] == "VIEW":
+            st.caption("Accounts: " + (", ".join(res["value"]) or "—"))
+            for sheet, rows in res["sections"].items():
+                st.subheader(sheet)
+                st.dataframe(rows, use_container_width=True)
+        elif res["kind"] == "TRADELIST":
+            page = res["page"]
+            st.dataframe(res["rows"], use_container_width=True)
+            st.caption(f"Page {page['page']} of {page['pages']} · {page['total']} rows")
         else:
-            st.error("No matching client in 'CLIENT'.")
+            st.dataframe(res["rows"], use_container_width=True)
+        export_buttons(res)
+
+def tradelist_options(wb: dict) -> dict:
+    # ovládanie stránky TRADELIST; server pošle len vybranú stránku a stĺpce
+    df = get_sheet_by_name(wb, "TRADELIST")
+    if df is None:
+        return {}
+    cols = list(df.columns)
+    st.subheader("Trade List")
+    c1, c2, c3, c4 = st.columns([4, 3, 2, 1])
+    columns = c1.multiselect("Columns", cols, default=cols, key="tl_columns")
+    filter_text = c2.text_input("Filter", key="tl_filter")
+    sort_by = c3.selectbox("Sort by", ["—"] + cols, key="tl_sort")
+    descending = c4.checkbox("Desc", key="tl_desc")
+    c5, c6 = st.columns([1, 1])
+    page_size = c5.selectbox("Rows per page", [50, 100, 250, 1000], index=1, key="tl_page_size")
+    page = c6.number_input("Page", min_value=1, value=1, step=1, key="tl_page")
+    return {
+        "page": page,
+        "page_size": page_size,
+        "sort_by": None if sort_by == "—" else sort_by,
+        "descending": descending,
+        "filter_text": filter_text.strip(),
+        "columns": columns,
+    }
+
+def render_suggestions(query: str, wb: dict):
+    # pri nezhode ponúkne kľúče začínajúce zadaným textom; klik doplní celý dotaz
+    res = suggest(query, wb)
+    if not res["suggestions"]:
         return
+    def pick(value: str):
+        st.session_state["query"] = f"{res['kind']} {value}"
+    more = res["total"] - len(res["suggestions"])
+    st.caption("Did you mean:" + (f" (+{more} more, type more characters)" if more > 0 else ""))
+    cols = st.columns(min(len(res["suggestions"]), 5))
+    for i, value in enumerate(res["suggestions"]):
+        cols[i % len(cols)].button(value, key=f"suggest_{res['source']}_{i}", on_click=pick, args=(value,))
 
-    # TRADELIST
-    if q.replace(" ", "").upper() == "TRADELIST":
-        df = get_sheet_by_name(sheets, "TRADELIST")
-        if df is None:
-            st.error("Sheet 'TRADELIST' not found.")
-            return
-        df = df.copy()
-        if "Instrument" in df.columns:
-            df["Instrument"] = df["Instrument"].astype(str).str.replace(".lmx", "", regex=False)
-        st.subheader("Trade List")
-        st.dataframe(df, use_container_width=True)
+def load_selected() -> dict:
+    # vybraný zdroj alebo všetky paralelne; nedostupný zdroj sa ohlási, ostatné pokračujú
+    workbooks = load_workbooks(None if source == ALL_SOURCES else [source])
+    for name, wb in workbooks.items():
+        if wb is None:
+            st.error(f"Source '{name}' is unavailable.")
+    return {name: wb for name, wb in workbooks.items() if wb is not None}
+
+def handle_query(query: str, workbooks: dict):
+    first = next(iter(workbooks.values()))
+    opts = tradelist_options(first) if parse_query(query.strip())[0] == "TRADELIST" else {}
+    for name, wb in workbooks.items():
+        if len(workbooks) > 1:
+            st.subheader(name)
+        res = run_query(query, wb, **opts)
+        render_result(res)
+        if not res["ok"] and res["kind"] in engine.QUERY_KINDS:
+            render_suggestions(query, wb)
+
+def handle_batch(lines: list, workbooks: dict):
+    with timed("lookup", query="BATCH", size=len(lines)):
+        parts = []
+        for name, wb in workbooks.items():
+            part = resolve_batch(wb, lines)
+            if len(workbooks) > 1:
+                part.insert(0, "source", name)
+            parts.append(part)
+        result = pd.concat(parts, ignore_index=True)
+    if result.empty:
+        st.warning("No queries found in the batch input.")
         return
+    with timed("render", query="BATCH", size=len(lines)):
+        found = result["match"].isin(["key", "any column"])
+        st.caption(f"{result.loc[found, 'query'].nunique()} of {result['query'].nunique()} queries matched.")
+        st.dataframe(result, use_container_width=True)
+        st.download_button(
+            "Download CSV", result.to_csv(index=False).encode("utf-8"), "batch_results.csv", "text/csv"
+        )
+
+# --- WATCHLIST (zmeny STATUS po refreshi; fragment sa obnovuje sám namiesto opakovaných dotazov) ---
+def _watch_add(names: list):
+    refs = st.session_state.get("watch_refs", "")
+    for name in names:
+        watch_add(refs.split(","), name)
 
-    st.warning("Please enter a valid query like STATUS …, CLIENT …, ACCOUNT … or CLIENT/ACCOUNT …")
+def _watch_remove(names: list):
+    for name in names:
+        watch_remove(st.session_state.get("watch_drop", []), name)
+
+@st.fragment(run_every=WATCH_REFRESH)
+def render_watchlist():
+    names = SOURCE_OPTIONS if source == ALL_SOURCES else [source]
+    watched = [w for w in watchlist() if w["source"] in names]
+    if watched:
+        load_workbooks(names)  # po TTL spustí refresh na pozadí; porovnanie urobí engine
+    feed = [e for e in watch_feed() if e["source"] in names]
+    seen = st.session_state.get("watch_seen", 0)
+    for event in feed:
+        if event["id"] > seen and seen:
+            st.toast(f"{event['reference']}: {event['old']} → {event['new']}")
+    st.session_state["watch_seen"] = max([seen] + [e["id"] for e in feed])
+    with st.expander(f"Watchlist ({len(watched)})", expanded=bool(feed)):
+        c1, c2 = st.columns([4, 1])
+        c1.text_input("Watch STATUS references (comma separated)", key="watch_refs")
+        c2.button("Watch", key="watch_add", on_click=_watch_add, args=(names,))
+        if watched:
+            st.dataframe(pd.DataFrame(watched), use_container_width=True)
+            c3, c4 = st.columns([4, 1])
+            c3.multiselect("Stop watching", sorted({w["reference"] for w in watched}), key="watch_drop")
+            c4.button("Remove", key="watch_remove", on_click=_watch_remove, args=(names,))
+        if feed:
+            st.caption("Recent changes")
+            st.dataframe(pd.DataFrame(feed[::-1]), use_container_width=True)
+
+# --- DEBUG PANEL (agregované časy fáz) ---
+def render_debug_panel():
+    with st.expander("Debug: stage timings"):
+        st.dataframe(pd.DataFrame(stage_summary()), use_container_width=True)
+        cache = result_cache_stats()
+        st.caption(f"Result cache: {cache['hits']} hits · {cache['misses']} misses · {cache['entries']}/{cache['size']} entries")
+        if len(SOURCE_OPTIONS) > 1:
+            st.caption("Sources")
+            st.dataframe(pd.DataFrame(source_status()), use_container_width=True)
+        st.code(metrics_text(), language="text")
+        memory = memory_report(None if source == ALL_SOURCES else source)
+        if memory:
+            st.caption("Sheet memory (deep, bytes)")
+            st.dataframe(pd.DataFrame.from_dict(memory, orient="index"), use_container_width=True)
+        changes = change_summary(None if source == ALL_SOURCES else source)
+        if changes:
+            st.caption(f"Workbook {changes['version'][:12]} — changes vs. previous version")
+            st.dataframe(pd.DataFrame.from_dict(changes["sheets"], orient="index"), use_container_width=True)
 
 # --- RUN ---
+with export_panel:
+    render_sheet_exports()
+
 if query:
-    simulated_loading()
-    handle_query(query)
+    with st.spinner("Loading workbook..."):
+        workbooks = load_selected()
+    if workbooks:
+        with st.spinner("Searching..."):
+            handle_query(query, workbooks)
+
+if run_batch:
+    try:
+        batch_lines = read_batch_lines(batch_text, batch_file)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError):
+        st.error("Could not read the uploaded CSV.")
+        batch_lines = []
+    if batch_lines:
+        with st.spinner("Loading workbook..."):
+            workbooks = load_selected()
+        if workbooks:
+            with st.spinner(f"Resolving {len(batch_lines)} queries..."):
+                handle_batch(batch_lines, workbooks)
+
+render_watchlist()
+
+if DEBUG_PANEL:
+    render_debug_panel()
@@ -0,0 +1,262 @@
+# --- BENCHMARK (syntetický workbook + lokálny HTTP stub namiesto EXCEL_URL) ---
+# python bench.py --rows 1000,10000,100000 --repeat 5 --out bench.json
+# python bench.py --rows 1000,10000 --compare bench.json     (exit 1 pri regresii nad --threshold)
+# python bench.py --rows 100000 --format zip                  (rovnaké dáta ako ZIP s Parquet listami)
+import argparse, hashlib, io, json, logging, os, platform, statistics, sys, threading, time, zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import openpyxl
+import pandas as pd
+import engine
+
+# vygenerované workbooky sa cachujú, 1M riadkov sa generuje niekoľko minút
+BENCH_CACHE_DIR = ".bench_cache"
+
+# --- SYNTETICKÝ WORKBOOK (rovnaké listy a stĺpce ako produkčný export) ---
+def make_workbook(rows: int) -> bytes:
+    path = os.path.join(BENCH_CACHE_DIR, f"workbook_{rows}.xlsx")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    accounts = max(rows // 10, 1)
+    clients = max(rows // 100, 1)
+    wb = openpyxl.Workbook(write_only=True)  # streamovaný zápis, inak 1M riadkov nezmestí do pamäte
+    ws = wb.create_sheet("STATUS")
+    ws.append(["Reference", "Status", "Account", "Updated"])
+    for i in range(rows):
+        ws.append([f"REF{i:07d}", ("OK", "PENDING", "FAILED")[i % 3], f"ACC{i % accounts:06d}", f"2024-01-{i % 28 + 1:02d}"])
+    ws = wb.create_sheet("ACCOUNT")
+    ws.append(["Account", "Client", "Currency", "Note"])
+    for i in range(accounts):
+        ws.append([f"ACC{i:06d}", f"CL{i % clients:05d}", ("EUR", "USD", "CHF")[i % 3], None if i % 7 else f"REF{i:07d}"])
+    ws = wb.create_sheet("CLIENTACCOUNT")
+    ws.append(["Account", "Client ID", "Type"])
+    for i in range(accounts):
+        ws.append([f"ACC{i:06d}", f"CL{i % clients:05d}", ("MARGIN", "CASH")[i % 2]])
+    ws = wb.create_sheet("CLIENT")
+    ws.append(["Client ID", "Name", "Country"])
+    for i in range(clients):
+        ws.append([f"CL{i:05d}", f"Client {i}", ("SK", "CZ", "DK")[i % 3]])
+    ws = wb.create_sheet("TRADELIST")
+    ws.append(["Instrument", "Account", "Qty", "Price"])
+    for i in range(rows):
+        ws.append([f"{('EURUSD', 'GBPUSD', 'AAPL:xnas')[i % 3]}.lmx", f"ACC{i % accounts:06d}", i % 1000, round(1 + i % 500 / 100, 2)])
+    os.makedirs(BENCH_CACHE_DIR, exist_ok=True)
+    wb.save(path)
+    with open(path, "rb") as f:
+        return f.read()
+
+# rovnaké listy v inom formáte zdroja (konverzia z XLSX, tiež cachovaná)
+def make_source(rows: int, fmt: str) -> bytes:
+    if fmt == "xlsx":
+        return make_workbook(rows)
+    path = os.path.join(BENCH_CACHE_DIR, f"workbook_{rows}.{fmt}")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    sheets = pd.read_excel(io.BytesIO(make_workbook(rows)), sheet_name=None, dtype=str)
+    if fmt == "zip":
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as z:
+            for name, df in sheets.items():
+                z.writestr(f"{name}.parquet", df.to_parquet(index=False))
+        body = buf.getvalue()
+    else:
+        body = json.dumps({name: df.to_dict(orient="records") for name, df in sheets.items()}).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(body)
+    return body
+
+# dotazy pre každú vetvu run_query: kľúčový stĺpec, fallback cez celý riadok, nezhoda
+def bench_queries(rows: int) -> dict:
+    accounts = max(rows // 10, 1)
+    clients = max(rows // 100, 1)
+    return {
+        "STATUS key": ("STATUS REF%07d" % (rows // 2), {}),
+        "STATUS miss": ("STATUS NOPE", {}),
+        "ACCOUNT key": ("ACCOUNT ACC%06d" % (accounts // 2), {}),
+        "ACCOUNT fallback": ("ACCOUNT CL%05d" % (clients // 2), {}),
+        "ACCOUNT miss": ("ACCOUNT NOPE", {}),
+        "CLIENT/ACCOUNT key": ("CLIENT/ACCOUNT ACC%06d" % (accounts // 2), {}),
+        "CLIENT/ACCOUNT fallback": ("CLIENT/ACCOUNT CL%05d" % (clients // 2), {}),
+        "CLIENT key": ("CLIENT CL%05d" % (clients // 2), {}),
+        "CLIENT miss": ("CLIENT NOPE", {}),
+        "VIEW": ("VIEW CL%05d" % (clients // 2), {}),
+        "TRADELIST page": ("TRADELIST", {"page": 2}),
+        "TRADELIST sort": ("TRADELIST", {"sort_by": "Qty", "descending": True}),
+        "TRADELIST filter": ("TRADELIST", {"filter_text": "GBPUSD"}),
+        "invalid": ("HELLO", {}),
+    }
+
+# --- STUB SERVER (ETag + 304 ako SharePoint/OneDrive) ---
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = b""
+    etag = ""
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub(body: bytes) -> ThreadingHTTPServer:
+    _StubHandler.body = body
+    _StubHandler.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- MERANIE ---
+def _reset_engine() -> None:
+    # studený proces: žiadny workbook, žiadne validátory
+    engine._state.update(etag=None, last_modified=None, content_type=None, sha256=None, workbook=None, checked_at=0.0,
+                         error=None)
+
+def _measure(fn, repeat: int, setup=None) -> list:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return times
+
+def _result(rows: int, op: str, times: list) -> dict:
+    return {
+        "rows": rows, "op": op, "n": len(times),
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "max_ms": round(max(times), 3),
+    }
+
+def bench_size(rows: int, repeat: int, fmt: str = "xlsx") -> list:
+    t0 = time.perf_counter()
+    body = make_source(rows, fmt)
+    log.info(json.dumps({"event": "bench_workbook", "rows": rows, "format": fmt, "bytes": len(body),
+                         "ms": round((time.perf_counter() - t0) * 1000.0, 1)}))
+    server = start_stub(body)
+    engine._state["url"] = f"http://127.0.0.1:{server.server_port}/workbook.{fmt}"
+    out = []
+    try:
+        out.append(_result(rows, "_fetch_bytes", _measure(lambda: engine._fetch_bytes(engine._state["url"]), repeat)))
+
+        def conditional_fetch():
+            engine._state.update(etag=_StubHandler.etag, last_modified=None)
+            engine._fetch_bytes(engine._state["url"], conditional=True)
+        out.append(_result(rows, "_fetch_bytes 304", _measure(conditional_fetch, repeat)))
+
+        out.append(_result(rows, "load_excel cold", _measure(engine.load_excel, repeat, setup=_reset_engine)))
+        out.append(_result(rows, "load_excel warm", _measure(engine.load_excel, repeat)))
+
+        # listy sa parsujú lenivo -> studený čas = parse + indexy, teplý = memo
+        for sheet in ["STATUS", "ACCOUNT", "CLIENTACCOUNT", "CLIENT", "TRADELIST"]:
+            def cold_setup():
+                _reset_engine()
+                engine.load_excel()
+            get = lambda: engine.get_sheet_by_name(engine.load_excel(), sheet)
+            out.append(_result(rows, f"get_sheet_by_name {sheet} cold", _measure(get, repeat, setup=cold_setup)))
+            out.append(_result(rows, f"get_sheet_by_name {sheet} warm", _measure(get, repeat)))
+
+        for name, (query, opts) in bench_queries(rows).items():
+            res = engine.run_query(query, **opts)  # prvý beh postaví indexy / join / poradie
+            if name.endswith("miss") or name == "invalid":
+                assert not res["ok"], name
+            else:
+                assert res["ok"], name
+            # bez cache výsledkov = práca nad DataFrame-ami; s cache = opakovaný horúci dotaz
+            cache_size, engine.RESULT_CACHE_SIZE = engine.RESULT_CACHE_SIZE, 0
+            out.append(_result(rows, f"query {name}", _measure(lambda: engine.run_query(query, **opts), repeat)))
+            engine.RESULT_CACHE_SIZE = cache_size
+            out.append(_result(rows, f"query {name} cached", _measure(lambda: engine.run_query(query, **opts), repeat)))
+
+        for query in ["STATUS REF00", "ACCOUNT ACC0", "CLIENT CL0"]:
+            engine.suggest(query)  # prvý beh postaví prefixový index
+            out.append(_result(rows, f"suggest {query}", _measure(lambda: engine.suggest(query), repeat)))
+    finally:
+        server.shutdown()
+        server.server_close()
+        _reset_engine()
+    return out
+
+# --- POROVNANIE S PREDCHÁDZAJÚCIM BEHOM ---
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    base = {(r["rows"], r["op"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get((r["rows"], r["op"]))
+        if b is None or not b["median_ms"]:
+            continue
+        ratio = r["median_ms"] / b["median_ms"]
+        r["baseline_median_ms"] = b["median_ms"]
+        r["ratio"] = round(ratio, 3)
+        # pod 1 ms je šum väčší ako rozdiel
+        if ratio > threshold and r["median_ms"] - b["median_ms"] > 1.0:
+            regressions.append(r)
+    return regressions
+
+log = logging.getLogger("b2b.saxo.bench")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark fetch, load, sheet parsing and every query type.")
+    parser.add_argument("--rows", default="1000,10000,100000", help="comma separated sizes, e.g. 1000,10000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="", help="write JSON results here (default stdout)")
+    parser.add_argument("--format", default="xlsx", choices=["xlsx", "zip", "json"],
+                        help="source format served by the stub (zip = one Parquet file per sheet)")
+    parser.add_argument("--compare", default="", help="baseline JSON from a previous run")
+    parser.add_argument("--threshold", type=float, default=1.2, help="median ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine.log.setLevel(logging.WARNING)  # bez JSON eventov z každej fázy
+    # predvolený zdroj: meriame parsovanie, nie diskovú cache; žiadne refreshe na pozadí počas merania
+    engine._state.update(cache_dir="", ttl=float("inf"))
+
+    results = []
+    for rows in (int(r) for r in args.rows.split(",") if r.strip()):
+        results.extend(bench_size(rows, args.repeat, args.format))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "xlsx_engine": engine.XLSX_ENGINE,
+            "source_format": args.format,
+            "compact_sheets": engine.COMPACT_SHEETS,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report["regressions"] = [f'{r["rows"]} {r["op"]}: x{r["ratio"]}' for r in regressions]
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    for line in report.get("regressions", []):
+        log.warning("regression %s", line)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1450 @@
+# --- ENGINE (bez Streamlitu: fetch, cache, indexy a dotazy; zdieľa ho UI aj JSON API) ---
+import os, io, csv, json, time, base64, bisect, shutil, zipfile, datetime, hashlib, logging, tempfile, threading, tomllib, requests
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from requests.exceptions import SSLError
+from urllib3.util.retry import Retry
+import numpy as np
+import pandas as pd
+try:
+    import fcntl
+except ImportError:  # Windows: bez medziprocesových zámkov, každý proces sťahuje sám
+    fcntl = None
+try:
+    import pyarrow as pa
+except ImportError:  # bez pyarrow sa listy na disk necachujú
+    pa = None
+
+log = logging.getLogger("b2b.saxo")
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+
+# --- CONFIGURATION (rovnaké poradie ako st.secrets -> env, aj mimo Streamlitu) ---
+def _load_secrets() -> dict:
+    secrets = {}
+    for path in (os.path.expanduser("~/.streamlit/secrets.toml"), os.path.join(".streamlit", "secrets.toml")):
+        try:
+            with open(path, "rb") as f:
+                secrets.update(tomllib.load(f))
+        except (FileNotFoundError, tomllib.TOMLDecodeError):
+            continue
+    return secrets
+
+_SECRETS = _load_secrets()
+
+def load_setting(key: str, default):
+    value = _SECRETS.get(key, os.getenv(key, default))  # Render → Environment (odporúčané)
+    if isinstance(default, bool) and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, dict) and isinstance(value, str):
+        return json.loads(value) if value.strip() else {}  # env premenná ako JSON objekt
+    return type(default)(value)
+
+EXCEL_URL = load_setting("EXCEL_URL", "https://data.saxoconnection.com/FIX_API_CT147572INET.xlsx")
+# viac protistrán: {"ct147572": "https://…/FIX_API_CT147572INET.xlsx", "acme": {"url": "https://…", "ttl": 60}}
+# (voliteľne aj "format" a "sheet" = názov listu pre jednotabuľkové CSV/Parquet)
+# (secrets.toml tabuľka [SOURCES] alebo env JSON); prázdne = jeden zdroj "default" z EXCEL_URL
+SOURCES = load_setting("SOURCES", {})
+# koľko zdrojov sa sťahuje naraz
+SOURCE_FETCH_WORKERS = load_setting("SOURCE_FETCH_WORKERS", 4)
+# zdroj, ktorý sa ešte nikdy nenačítal a zlyháva: ďalší studený pokus až po 1, 2, 4, … s (strop v sekundách)
+SOURCE_RETRY_MAX = load_setting("SOURCE_RETRY_MAX", 60.0)
+
+# sieť: timeouty na jeden pokus (s), retry s jitter backoffom, platnosť HTTPS -> HTTP rozhodnutia (s)
+FETCH_CONNECT_TIMEOUT = load_setting("FETCH_CONNECT_TIMEOUT", 5.0)
+FETCH_READ_TIMEOUT = load_setting("FETCH_READ_TIMEOUT", 20.0)
+FETCH_RETRIES = load_setting("FETCH_RETRIES", 3)
+FETCH_BACKOFF = load_setting("FETCH_BACKOFF", 0.5)
+TLS_FALLBACK_TTL = load_setting("TLS_FALLBACK_TTL", 3600.0)
+# sťahovanie po blokoch: max. veľkosť súboru (B), do koľkých B zostáva v pamäti, väčšie ide do temp súboru
+FETCH_MAX_BYTES = load_setting("FETCH_MAX_BYTES", 200_000_000)
+FETCH_SPOOL_BYTES = load_setting("FETCH_SPOOL_BYTES", 8_000_000)
+FETCH_CHUNK_BYTES = 1 << 20
+# lokálna Arrow cache rozparsovaných listov, zdieľaná procesmi na hoste (prázdne = vypnutá)
+SHEET_CACHE_DIR = load_setting("SHEET_CACHE_DIR", ".sheet_cache")
+# XLSX reader: auto = calamine ak je nainštalovaný, inak openpyxl (read-only)
+XLSX_ENGINE = load_setting("XLSX_ENGINE", "auto")
+# formát zdroja: auto (Content-Type / magic bytes) | xlsx | csv | parquet | json | zip (per zdroj: "format" v SOURCES)
+SOURCE_FORMAT = load_setting("SOURCE_FORMAT", "auto")
+# po koľkých sekundách sa workbook overuje na pozadí (stale-while-revalidate)
+WORKBOOK_TTL = load_setting("WORKBOOK_TTL", 300.0)
+# TRADELIST sa posiela po stránkach (predvolená a maximálna veľkosť stránky)
+TRADELIST_PAGE_SIZE = load_setting("TRADELIST_PAGE_SIZE", 100)
+TRADELIST_MAX_PAGE_SIZE = load_setting("TRADELIST_MAX_PAGE_SIZE", 5000)
+# kompaktné listy: kategórie pre nekľúčové stĺpce s málo hodnotami (text už je v Arrow stringoch)
+COMPACT_SHEETS = load_setting("COMPACT_SHEETS", False)
+COMPACT_MAX_UNIQUE_RATIO = load_setting("COMPACT_MAX_UNIQUE_RATIO", 0.5)
+# počet návrhov pri písaní (STATUS/ACCOUNT/CLIENT prefix)
+SUGGEST_LIMIT = load_setting("SUGGEST_LIMIT", 10)
+SUGGEST_MAX_LIMIT = 100
+# LRU cache výsledkov dotazov (počet položiek, 0 = vypnutá); kľúč obsahuje verziu workbooku
+RESULT_CACHE_SIZE = load_setting("RESULT_CACHE_SIZE", 1024)
+# pri štarte procesu stiahnuť, rozparsovať a zaindexovať všetky zdroje (readiness až potom)
+WARMUP = load_setting("WARMUP", True)
+# keď sa pri štarte nenačíta žiadny zdroj, warmup sa opakuje s backoffom 1, 2, 4, … s až do tohto stropu
+WARMUP_RETRY_MAX = load_setting("WARMUP_RETRY_MAX", 60.0)
+# export CSV/Parquet po blokoch (riadky na blok / row group)
+EXPORT_CHUNK_ROWS = load_setting("EXPORT_CHUNK_ROWS", 50000)
+# watchlist STATUS referencií: počiatočné referencie (čiarkou), voliteľný webhook a dĺžka feedu
+WATCHLIST = load_setting("WATCHLIST", "")
+WATCH_WEBHOOK_URL = load_setting("WATCH_WEBHOOK_URL", "")
+WATCH_FEED_SIZE = load_setting("WATCH_FEED_SIZE", 200)
+
+# --- METRICS (časy fáz: štruktúrovaný log + Prometheus text) ---
+STAGES = ["fetch", "parse", "index", "lookup", "render"]
+
+_metrics = {"lock": threading.Lock(), "stages": {}}  # stage -> [count, sum_s, max_s]
+
+@contextmanager
+def timed(stage: str, **fields):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics = _metrics
+        with metrics["lock"]:
+            entry = metrics["stages"].setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+        log.info(json.dumps({"event": "stage", "stage": stage, "seconds": round(elapsed, 6), **fields}))
+
+def metrics_text() -> str:
+    metrics = _metrics
+    with metrics["lock"]:
+        stages = {k: list(v) for k, v in metrics["stages"].items()}
+    lines = [
+        "# HELP b2b_stage_seconds Time spent per stage.",
+        "# TYPE b2b_stage_seconds summary",
+    ]
+    for stage, (count, total, _) in sorted(stages.items()):
+        lines.append(f'b2b_stage_seconds_count{{stage="{stage}"}} {count}')
+        lines.append(f'b2b_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+    lines += ["# HELP b2b_stage_seconds_max Slowest observation per stage.", "# TYPE b2b_stage_seconds_max gauge"]
+    for stage, (_, _, worst) in sorted(stages.items()):
+        lines.append(f'b2b_stage_seconds_max{{stage="{stage}"}} {worst:.6f}')
+    cache = result_cache_stats()
+    lines += [
+        "# HELP b2b_result_cache_requests_total Query result cache lookups.",
+        "# TYPE b2b_result_cache_requests_total counter",
+        f'b2b_result_cache_requests_total{{result="hit"}} {cache["hits"]}',
+        f'b2b_result_cache_requests_total{{result="miss"}} {cache["misses"]}',
+        "# HELP b2b_result_cache_entries Cached query results.",
+        "# TYPE b2b_result_cache_entries gauge",
+        f'b2b_result_cache_entries {cache["entries"]}',
+    ]
+    return "\n".join(lines) + "\n"
+
+def stage_summary() -> list:
+    with _metrics["lock"]:
+        stages = {k: list(v) for k, v in _metrics["stages"].items()}
+    return [
+        {"stage": s, "count": stages[s][0], "avg_ms": 1000 * stages[s][1] / stages[s][0], "max_ms": 1000 * stages[s][2]}
+        for s in STAGES if s in stages
+    ]
+
+# --- FETCH STATE (jeden na zdroj: validátory + aktuálny workbook) ---
+DEFAULT_SOURCE = "default"
+
+def _new_source_state(name: str, url: str, ttl: float, cache_dir: str, fmt: str = SOURCE_FORMAT, sheet: str = "") -> dict:
+    return {
+        "name": name,
+        "url": url,
+        "ttl": ttl,  # po koľkých sekundách sa zdroj overuje na pozadí
+        "cache_dir": cache_dir,
+        "format": fmt,
+        "sheet": sheet,  # názov listu pre CSV/Parquet s jednou tabuľkou (prázdne = meno súboru z URL)
+        "content_type": None,
+        "etag": None,
+        "last_modified": None,
+        "sha256": None,
+        "workbook": None,
+        "plain_http_until": 0.0,
+        "checked_at": 0.0,  # posledné overenie voči serveru
+        "error": None,  # posledná chyba sťahovania (zdroj ďalej slúži poslednú dobrú verziu)
+        # zlyhané studené načítania: generácia (rastie pri každom zlyhaní), séria za sebou, čas a výnimka
+        "failures": 0,
+        "fail_streak": 0,
+        "failed_at": 0.0,
+        "failure": None,
+        "cold_load": None,  # future práve bežiaceho studeného načítania (zdieľajú ho súbežní volajúci)
+        "cold_lock": threading.Lock(),
+        "refresh_lock": threading.Lock(),  # single-flight: naraz beží max. jeden refresh zdroja
+    }
+
+def _configured_sources() -> dict:
+    if not SOURCES:
+        return {DEFAULT_SOURCE: _new_source_state(DEFAULT_SOURCE, EXCEL_URL, WORKBOOK_TTL, SHEET_CACHE_DIR)}
+    sources = {}
+    for name, cfg in SOURCES.items():
+        cfg = cfg if isinstance(cfg, dict) else {"url": cfg}
+        # každý zdroj má vlastný podadresár cache (pruning verzií sa navzájom neovplyvní)
+        cache_dir = os.path.join(SHEET_CACHE_DIR, name) if SHEET_CACHE_DIR else ""
+        sources[name] = _new_source_state(name, cfg["url"], float(cfg.get("ttl", WORKBOOK_TTL)), cache_dir,
+                                          cfg.get("format", SOURCE_FORMAT), cfg.get("sheet", ""))
+    return sources
+
+_sources = _configured_sources()
+_state = next(iter(_sources.values()))  # predvolený zdroj = prvý v SOURCES
+# oddelené pooly: studené načítanie, na ktoré čaká request, nikdy nestojí za refreshom na pozadí
+# ani za watchlist webhookom (stale-while-revalidate: teplý zdroj odpovedá hneď)
+_fetch_pool = ThreadPoolExecutor(max_workers=SOURCE_FETCH_WORKERS, thread_name_prefix="fetch")
+_refresh_pool = ThreadPoolExecutor(max_workers=SOURCE_FETCH_WORKERS, thread_name_prefix="refresh")
+_watch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="watch")  # poradie udalostí zachované
+
+def source_names() -> list:
+    return list(_sources)
+
+def _source_state(source: str | None) -> dict:
+    if source is None:
+        return _state
+    if source not in _sources:
+        raise KeyError(f"Unknown source '{source}'.")
+    return _sources[source]
+
+# --- HTTP SESSION (keep-alive pool + ohraničené retry s jitter backoffom) ---
+def _new_http_session() -> requests.Session:
+    retry = Retry(
+        total=FETCH_RETRIES,
+        other=0,  # SSL chyby neopakujeme -> rýchly prechod na HTTP fallback
+        backoff_factor=FETCH_BACKOFF,
+        backoff_jitter=FETCH_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=max(2, SOURCE_FETCH_WORKERS), pool_maxsize=8)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_session = _new_http_session()
+
+# --- NETWORK HELPER (HTTPS -> HTTP fallback pri self-signed, podmienený GET, stream s limitom) ---
+def _expected_sha256(headers) -> bytes | None:
+    # Repr-Digest: sha-256=:<base64>: (RFC 9530) alebo starší Digest: SHA-256=<base64> (RFC 3230)
+    for header in ("Repr-Digest", "Digest"):
+        for item in headers.get(header, "").split(","):
+            algo, _, value = item.strip().partition("=")
+            if algo.lower() == "sha-256" and value:
+                try:
+                    return base64.b64decode(value.strip(":"))
+                except ValueError:
+                    return None
+    return None
+
+def _read_body(r: requests.Response) -> tuple[bytes, str]:
+    # body po blokoch do spooled temp súboru (veľké na disk), potom jedno čítanie -> v pamäti je len jedna kópia;
+    # vráti aj sha256 spočítaný počas sťahovania (= verzia workbooku, netreba hashovať znova)
+    expected = r.headers.get("Content-Length")
+    if expected is not None and int(expected) > FETCH_MAX_BYTES:
+        raise ValueError(f"Workbook is {int(expected)} bytes, over FETCH_MAX_BYTES ({FETCH_MAX_BYTES}).")
+    encoded = r.headers.get("Content-Encoding", "identity") != "identity"
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(FETCH_SPOOL_BYTES) as f:
+        for chunk in r.iter_content(FETCH_CHUNK_BYTES):
+            size += len(chunk)
+            if size > FETCH_MAX_BYTES:
+                raise ValueError(f"Workbook is over FETCH_MAX_BYTES ({FETCH_MAX_BYTES}), download aborted.")
+            digest.update(chunk)
+            f.write(chunk)
+        # Content-Length a digest platia pre prenesené bajty -> pri gzip ich nevieme porovnať
+        if expected is not None and not encoded and size != int(expected):
+            raise IOError(f"Truncated workbook download: {size} of {expected} bytes.")
+        sha256 = _expected_sha256(r.headers)
+        if sha256 is not None and not encoded and digest.digest() != sha256:
+            raise IOError("Workbook download does not match the server's SHA-256 digest.")
+        f.seek(0)
+        return f.read(), digest.hexdigest()
+
+def _fetch_bytes(url: str, conditional: bool = False, state: dict | None = None) -> tuple[bytes, str] | None:
+    # vráti (obsah, sha256) alebo None, ak server odpovie 304 Not Modified; validátory a TLS fallback sú per zdroj
+    state = state or _state
+    headers = {}
+    if conditional:
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state["last_modified"]:
+            headers["If-Modified-Since"] = state["last_modified"]
+
+    def _get(u: str) -> tuple[bytes, str] | None:
+        with _session.get(
+            u, headers=headers, timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT), stream=True
+        ) as r:  # verify=True default
+            if r.status_code == 304:
+                return None
+            r.raise_for_status()
+            body = _read_body(r)
+            # validátory až po celom a overenom body: pri prerušenom sťahovaní by ďalší podmienený GET
+            # dostal 304 a nová verzia by sa nikdy nestiahla
+            state["etag"] = r.headers.get("ETag")
+            state["last_modified"] = r.headers.get("Last-Modified")
+            state["content_type"] = r.headers.get("Content-Type")
+            return body
+
+    if not url.startswith("https://"):
+        return _get(url)
+    plain = "http://" + url[len("https://"):]
+    if time.time() < state["plain_http_until"]:
+        return _get(plain)  # zapamätaný fallback, HTTPS pokus preskočíme
+    try:
+        return _get(url)
+    except SSLError:
+        state["plain_http_until"] = time.time() + TLS_FALLBACK_TTL
+        return _get(plain)
+
+# --- INDEXES (kľúč -> pozície riadkov, stavia sa raz pri načítaní) ---
+KEY_COLUMNS = {
+    "STATUS": ["Reference"],
+    "ACCOUNT": ["Account"],
+    "CLIENTACCOUNT": ["Account"],
+    "CLIENT": ["Client ID", "ClientID", "Client"],
+}
+
+def _build_key_index(df: pd.DataFrame, col: str) -> dict:
+    # rovnaké zhody ako df[df[col] == val]; prázdne bunky sa neindexujú
+    return df.groupby(col, sort=False, observed=True).indices
+
+def build_indexes(sheet: str, df: pd.DataFrame) -> dict:
+    cols = [c for c in KEY_COLUMNS.get(sheet, []) if c in df.columns]
+    return {c: _build_key_index(df, c) for c in cols}
+
+# listy s fallbackom "hľadaj v ľubovoľnom stĺpci"
+VALUE_INDEX_SHEETS = ["ACCOUNT", "CLIENTACCOUNT", "CLIENT"]
+
+def _build_value_index(df: pd.DataFrame) -> dict:
+    # hodnota bunky -> vzostupné pozície riadkov, ktoré ju obsahujú (bez duplicít)
+    if df.empty:
+        return {}
+    cells = pd.DataFrame({
+        "v": df.to_numpy(dtype=object).ravel(),
+        "r": np.repeat(np.arange(len(df)), df.shape[1]),
+    }).dropna().drop_duplicates()
+    rows = cells["r"].to_numpy()
+    return {v: rows[pos] for v, pos in cells.groupby("v", sort=False).indices.items()}
+
+# --- DISK CACHE (zdieľaná medzi procesmi na jednom hoste; kľúč = sha256 obsahu) ---
+# <cache_dir>/CURRENT            digest aktuálnej verzie
+# <cache_dir>/CHECKED            čas posledného overenia voči serveru (ktorýmkoľvek procesom)
+# <cache_dir>/<digest>/          workbook.<formát> + manifest.json + <i>.arrow/<i>.json per list
+# cache_dir = SHEET_CACHE_DIR, pri viacerých zdrojoch SHEET_CACHE_DIR/<zdroj>; prázdne = vypnutá
+def _cache_path(cache_dir: str, digest: str, *parts: str) -> str:
+    return os.path.join(cache_dir, digest, *parts)
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+@contextmanager
+def _shared_lock(cache_dir: str, *parts: str):
+    # exkluzívny flock: jeden proces sťahuje/parsuje, ostatné počkajú a prevezmú výsledok
+    if not cache_dir or fcntl is None:
+        yield
+        return
+    path = os.path.join(cache_dir, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _write_disk_manifest(cache_dir: str, digest: str, content: bytes, sheet_names: list, etag, last_modified,
+                         fmt: str = "xlsx", sheet_hint: str = "") -> None:
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(_cache_path(cache_dir, digest), exist_ok=True)
+        _atomic_write(_cache_path(cache_dir, digest, f"workbook.{fmt}"), content)
+        manifest = {"version": digest, "etag": etag, "last_modified": last_modified, "sheet_names": sheet_names,
+                    "format": fmt, "sheet_hint": sheet_hint}
+        _atomic_write(_cache_path(cache_dir, digest, "manifest.json"), json.dumps(manifest).encode("utf-8"))
+        _atomic_write(os.path.join(cache_dir, "CURRENT"), digest.encode("utf-8"))
+        for entry in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, entry)
+            if entry != digest and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+    except Exception:
+        log.warning("sheet cache write failed", exc_info=True)
+
+def _mark_shared_checked(cache_dir: str, checked_at: float) -> None:
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _atomic_write(os.path.join(cache_dir, "CHECKED"), str(checked_at).encode("utf-8"))
+    except Exception:
+        log.warning("sheet cache write failed", exc_info=True)
+
+def _read_shared_checked(cache_dir: str) -> float:
+    if not cache_dir:
+        return 0.0
+    try:
+        with open(os.path.join(cache_dir, "CHECKED"), encoding="utf-8") as f:
+            return float(f.read().strip())
+    except (OSError, ValueError):
+        return 0.0
+
+def _read_disk_manifest(cache_dir: str) -> tuple[dict, bytes] | None:
+    if not cache_dir:
+        return None
+    try:
+        with open(os.path.join(cache_dir, "CURRENT"), encoding="utf-8") as f:
+            digest = f.read().strip()
+        with open(_cache_path(cache_dir, digest, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        # surový obsah zdroja do pamäte, aby neskoršie pruning adresára nerozbilo lenivé parsovanie
+        manifest.setdefault("format", "xlsx")  # cache zo staršej verzie (len XLSX)
+        manifest.setdefault("sheet_hint", "")
+        with open(_cache_path(cache_dir, digest, f"workbook.{manifest['format']}"), "rb") as f:
+            return manifest, f.read()
+    except FileNotFoundError:
+        return None
+    except Exception:
+        log.warning("sheet cache read failed", exc_info=True)
+        return None
+
+def _write_cached_sheet(cache_dir: str, digest: str, i: int, df: pd.DataFrame) -> None:
+    if not cache_dir or pa is None or not os.path.isdir(_cache_path(cache_dir, digest)):
+        return
+    try:
+        # Arrow IPC chce unikátne string názvy stĺpcov -> originály idú do JSON vedľa
+        _atomic_write(_cache_path(cache_dir, digest, f"{i}.json"), json.dumps({"columns": list(df.columns)}).encode("utf-8"))
+        table = pa.Table.from_pandas(df.set_axis([str(j) for j in range(df.shape[1])], axis=1), preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        _atomic_write(_cache_path(cache_dir, digest, f"{i}.arrow"), sink.getvalue().to_pybytes())
+    except Exception:
+        log.warning("sheet cache write failed", exc_info=True)
+
+# pandas "str" s pyarrow úložiskom a NaN ako chýbajúca hodnota = rovnaký dtype ako čerstvo parsovaný list
+_ARROW_TEXT = {t: pd.StringDtype("pyarrow", na_value=np.nan) for t in (pa.string(), pa.large_string())} if pa else {}
+
+def _read_cached_sheet(cache_dir: str, digest: str, i: int) -> pd.DataFrame | None:
+    if not cache_dir or pa is None:
+        return None
+    try:
+        # memory-map: stránky súboru zdieľajú všetky procesy cez page cache
+        table = pa.ipc.open_file(pa.memory_map(_cache_path(cache_dir, digest, f"{i}.arrow"), "r")).read_all()
+        with open(_cache_path(cache_dir, digest, f"{i}.json"), encoding="utf-8") as f:
+            columns = json.load(f)["columns"]
+        # textové stĺpce ostávajú Arrow pole nad namapovanými stránkami (bez kópie do Python str objektov)
+        return table.to_pandas(types_mapper=_ARROW_TEXT.get).set_axis(columns, axis=1)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        log.warning("sheet cache read failed", exc_info=True)
+        return None
+
+# --- SOURCE FORMATS (XLSX/CSV/Parquet/JSON/ZIP -> rovnaké listy ako DataFrame-y s textovými hodnotami) ---
+# reader = {"sheet_names": [...], "parse": funkcia(list) -> surový DataFrame}; listy sa parsujú lenivo
+SOURCE_FORMATS = ["xlsx", "csv", "parquet", "json", "zip"]
+CONTENT_TYPES = {
+    "spreadsheetml": "xlsx", "ms-excel": "xlsx", "parquet": "parquet", "json": "json",
+    "text/csv": "csv", "text/plain": "csv", "zip": "zip",
+}
+
+def _detect_format(content: bytes, content_type: str | None, url: str) -> str:
+    # magic bytes majú prednosť (servery často posielajú application/octet-stream)
+    if content[:4] == b"PAR1":
+        return "parquet"
+    if content[:4] == b"PK\x03\x04":
+        with zipfile.ZipFile(io.BytesIO(content)) as z:
+            return "xlsx" if "xl/workbook.xml" in z.namelist() else "zip"
+    for marker, fmt in CONTENT_TYPES.items():
+        if content_type and marker in content_type.lower():
+            return fmt
+    ext = os.path.splitext(urlsplit(url).path)[1].lower().lstrip(".")
+    if ext in SOURCE_FORMATS:
+        return ext
+    return "json" if content.lstrip()[:1] in (b"{", b"[") else "csv"
+
+def _as_text(df: pd.DataFrame) -> pd.DataFrame:
+    # rovnaké typy ako XLSX s dtype=str: všetko text, prázdne bunky NaN; chýbajúce hodnoty sa na text
+    # nekonvertujú vôbec (astype("str") z nich na pandas 2.x robí "None"/"nan")
+    text = df.astype(object).apply(lambda col: col.map(str, na_action="ignore"))
+    return text.astype(pd.StringDtype(na_value=np.nan))
+
+def _open_xlsx(source: bytes) -> pd.ExcelFile:
+    readers = ["calamine", "openpyxl"] if XLSX_ENGINE == "auto" else [XLSX_ENGINE]
+    for reader in readers[:-1]:
+        try:
+            return pd.ExcelFile(io.BytesIO(source), engine=reader)
+        except ImportError:
+            continue
+    # pandas otvára openpyxl v read_only režime
+    return pd.ExcelFile(io.BytesIO(source), engine=readers[-1])
+
+def _read_csv(content: bytes) -> pd.DataFrame:
+    head = content[:65536].decode("utf-8-sig", errors="ignore")
+    try:
+        sep = csv.Sniffer().sniff(head, delimiters=",;\t|").delimiter
+    except csv.Error:
+        sep = ","
+    return pd.read_csv(io.BytesIO(content), sep=sep, dtype=str, encoding="utf-8-sig")
+
+def _read_parquet(content: bytes) -> pd.DataFrame:
+    return _as_text(pd.read_parquet(io.BytesIO(content), dtype_backend="numpy_nullable"))
+
+def _read_records(records: list) -> pd.DataFrame:
+    return _as_text(pd.DataFrame(records, dtype=object))
+
+def _single_sheet(name: str, parse) -> dict:
+    return {"sheet_names": [name], "parse": lambda _: parse()}
+
+def _open_source(fmt: str, content: bytes, sheet_hint: str) -> dict:
+    if fmt == "xlsx":
+        xls = _open_xlsx(content)
+        return {"sheet_names": list(xls.sheet_names), "parse": lambda name: xls.parse(name, dtype=str)}
+    if fmt == "csv":
+        return _single_sheet(sheet_hint, lambda: _read_csv(content))
+    if fmt == "parquet":
+        return _single_sheet(sheet_hint, lambda: _read_parquet(content))
+    if fmt == "json":
+        data = json.loads(content)
+        if isinstance(data, list):
+            return _single_sheet(sheet_hint, lambda: _read_records(data))
+        # {"STATUS": [{...}, ...], "ACCOUNT": [...]} -> list per kľúč
+        return {"sheet_names": list(data), "parse": lambda name: _read_records(data[name])}
+    if fmt == "zip":
+        # archív s jedným súborom na list: STATUS.csv, ACCOUNT.parquet, ...
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        members = {
+            os.path.splitext(os.path.basename(m))[0]: m for m in archive.namelist()
+            if os.path.splitext(m)[1].lower().lstrip(".") in ("csv", "parquet", "json") and not m.startswith("__MACOSX/")
+        }
+
+        def parse(name: str) -> pd.DataFrame:
+            data = archive.read(members[name])
+            member_fmt = os.path.splitext(members[name])[1].lower().lstrip(".")
+            member = _open_source(member_fmt, data, name)
+            return member["parse"](member["sheet_names"][0])
+        return {"sheet_names": list(members), "parse": parse}
+    raise ValueError(f"Unsupported source format '{fmt}'.")
+
+def _sheet_hint(state: dict) -> str:
+    # názov listu pre jednotabuľkové formáty: "sheet" zo SOURCES, inak meno súboru (…/TRADELIST.parquet)
+    return state["sheet"] or os.path.splitext(os.path.basename(urlsplit(state["url"]).path))[0]
+
+# --- DATA LOADER (listy sa parsujú lenivo, až pri prvom get_sheet_by_name) ---
+def _new_workbook(state: dict, version: str, sheet_names: list, source: bytes, reader: dict | None = None,
+                  fmt: str = "xlsx", sheet_hint: str = "") -> dict:
+    return {
+        "source_name": state["name"],
+        "cache_dir": state["cache_dir"],
+        "version": version,
+        "sheet_names": sheet_names,
+        "source": source,
+        "format": fmt,
+        "sheet_hint": sheet_hint,
+        "reader": reader,
+        "lock": threading.RLock(),
+        # memo per verzia workbooku, plní _load_sheet (a _client_view)
+        "sheets": {},
+        "indexes": {},
+        "value_indexes": {},
+        "client_view": None,
+        "sort_orders": {},  # (list, stĺpec, desc) -> poradie pozícií
+        "prefix_indexes": {},  # list -> (utriedené kľúče veľkými písmenami, originálne hodnoty)
+        # listy načítané v predchádzajúcej verzii (df, indexy) -> inkrementálny refresh
+        "previous": {},
+        "changes": {},  # list -> súhrn zmien voči predchádzajúcej verzii
+        "memory": {},  # list -> bajty pred/po kompaktovaní (COMPACT_SHEETS)
+    }
+
+def _parse_sheet(wb: dict, name: str) -> pd.DataFrame:
+    if wb["reader"] is None:
+        wb["reader"] = _open_source(wb["format"], wb["source"], wb["sheet_hint"])
+    df = wb["reader"]["parse"](name)
+    return df.loc[:, ~df.columns.astype(str).str.startswith("Unnamed")]
+
+def _prepare_sheet(key: str, df: pd.DataFrame) -> pd.DataFrame:
+    # jednorazové úpravy po načítaní, nie pri každom dotaze
+    if key == "TRADELIST" and "Instrument" in df.columns:
+        df = df.assign(Instrument=df["Instrument"].astype(str).str.replace(".lmx", "", regex=False))
+    return df
+
+# --- COMPACT MODE (menšia pamäťová stopa listov v cache) ---
+def _compact_sheet(key: str, df: pd.DataFrame) -> pd.DataFrame:
+    key_cols = set(KEY_COLUMNS.get(key, []))
+    out = {}
+    for j, c in enumerate(df.columns):
+        col = df.iloc[:, j]
+        if c in key_cols:
+            pass  # kľúče ostávajú Arrow stringy (pandas "str"), indexy nad nimi sa nemenia
+        elif isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.cat.remove_unused_categories()
+        elif len(col) and col.nunique() <= COMPACT_MAX_UNIQUE_RATIO * len(col):
+            col = col.astype("category")
+        out[j] = col
+    compact = pd.concat(out, axis=1) if out else df
+    compact.columns = df.columns
+    return compact
+
+def memory_report(source: str | None = None) -> dict:
+    # list -> bajty (deep); pri COMPACT_SHEETS aj stav pred kompaktovaním
+    wb = _source_state(source)["workbook"]
+    if wb is None:
+        return {}
+    with wb["lock"]:
+        sheets = dict(wb["sheets"])
+        report = {name: dict(mem) for name, mem in wb["memory"].items()}
+    for name, df in sheets.items():
+        report.setdefault(name, {})["bytes"] = int(df.memory_usage(deep=True).sum())
+    return report
+
+# --- INCREMENTAL REFRESH (diff podľa kľúča, záplata rámca a indexov len pre zmenené riadky) ---
+def _patch_positions(index: dict, removals: list, additions: list) -> dict:
+    # copy-on-write: stará verzia workbooku ostáva nedotknutá pre rozbehnuté dotazy
+    index = dict(index)
+    touched = {}
+    for value, pos in removals:
+        if not pd.isna(value):
+            touched.setdefault(value, set(index.get(value, ()))).discard(pos)
+    for value, pos in additions:
+        if not pd.isna(value):
+            touched.setdefault(value, set(index.get(value, ()))).add(pos)
+    for value, positions in touched.items():
+        if positions:
+            index[value] = np.array(sorted(positions))
+        else:
+            index.pop(value, None)
+    return index
+
+def _diff_sheet(key: str, old: pd.DataFrame, new: pd.DataFrame):
+    # vráti (pozície zmenených v old, ich pozície v new, nové pozície v new, počet zmazaných,
+    # či sú spoločné riadky v rovnakom poradí a nové až za nimi) alebo None, ak sa list podľa kľúča porovnať nedá
+    cols = [c for c in KEY_COLUMNS.get(key, []) if c in new.columns]
+    if not cols or list(old.columns) != list(new.columns) or not old.columns.is_unique:
+        return None
+    old_keys, new_keys = pd.Index(old[cols[0]]), pd.Index(new[cols[0]])
+    if not (old_keys.is_unique and new_keys.is_unique) or old_keys.hasnans or new_keys.hasnans:
+        return None
+    new_in_old = old_keys.get_indexer(new_keys)
+    common = np.flatnonzero(new_in_old >= 0)
+    a = old.iloc[new_in_old[common]].to_numpy(dtype=object, na_value=None)
+    b = new.iloc[common].to_numpy(dtype=object, na_value=None)
+    same = (a == b) | (pd.isna(a) & pd.isna(b))
+    changed = common[~same.all(axis=1)] if len(common) else common
+    # záplata zachová poradie nového súboru len vtedy, keď new = old (v tom istom poradí) + riadky na konci
+    aligned = len(common) == len(old) and np.array_equal(new_in_old[:len(old)], np.arange(len(old)))
+    return new_in_old[changed], changed, np.flatnonzero(new_in_old < 0), len(old) - len(common), aligned
+
+def _apply_sheet_diff(key: str, prev: tuple, new: pd.DataFrame) -> tuple:
+    # vráti (záplata alebo None -> plný rebuild, súhrn zmien alebo None);
+    # záplata musí dať rovnaký rámec ako čerstvé načítanie (poradie riadkov = poradie v súbore)
+    old, old_indexes, old_values = prev
+    diff = _diff_sheet(key, old, new)
+    if diff is None:
+        return None, None
+    upd_old, upd_new, inserted, deleted, aligned = diff
+    summary = {"mode": "patch", "inserted": len(inserted), "updated": len(upd_old), "deleted": deleted}
+    if deleted or not aligned:
+        return None, {**summary, "mode": "rebuild"}  # zmazané / presunuté riadky by posunuli pozície
+    if not len(upd_old) and not len(inserted):
+        return (old, old_indexes, old_values), summary
+    df = pd.concat([old, new.iloc[inserted]], ignore_index=True) if len(inserted) else old.copy()
+    if len(upd_old):
+        for j in range(df.shape[1]):
+            col = df.iloc[:, j]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                missing = pd.Index(new.iloc[upd_new, j].dropna().unique()).difference(col.cat.categories)
+                if len(missing):
+                    df.isetitem(j, col.cat.add_categories(missing))
+        df.iloc[upd_old, :] = new.iloc[upd_new].to_numpy(dtype=object)
+    ins_pos = range(len(old), len(old) + len(inserted))
+    old_rows = old.iloc[upd_old].to_numpy(dtype=object)
+    new_rows = df.iloc[np.concatenate([upd_old, list(ins_pos)]).astype(int)].to_numpy(dtype=object)
+    touched = list(upd_old) + list(ins_pos)
+
+    indexes = {}
+    for c, index in old_indexes.items():
+        j = df.columns.get_loc(c)
+        indexes[c] = _patch_positions(
+            index,
+            [(row[j], p) for row, p in zip(old_rows, upd_old)],
+            [(row[j], p) for row, p in zip(new_rows, touched)],
+        )
+    values = None
+    if old_values is not None:
+        values = _patch_positions(
+            old_values,
+            [(v, p) for row, p in zip(old_rows, upd_old) for v in set(row) if not pd.isna(v)],
+            [(v, p) for row, p in zip(new_rows, touched) for v in set(row) if not pd.isna(v)],
+        )
+    return (df, indexes, values), summary
+
+def _load_sheet(wb: dict, name: str) -> pd.DataFrame:
+    df = wb["sheets"].get(name)
+    if df is not None:
+        return df
+    with wb["lock"]:
+        if name in wb["sheets"]:
+            return wb["sheets"][name]
+        i = wb["sheet_names"].index(name)
+        with timed("parse", sheet=name, source=wb["source_name"]):
+            df = _read_cached_sheet(wb["cache_dir"], wb["version"], i)
+            if df is None:
+                # list parsuje len jeden proces, ostatné ho potom namapujú z disku
+                with _shared_lock(wb["cache_dir"], wb["version"], f"{i}.lock"):
+                    df = _read_cached_sheet(wb["cache_dir"], wb["version"], i)
+                    if df is None:
+                        df = _parse_sheet(wb, name)
+                        _write_cached_sheet(wb["cache_dir"], wb["version"], i, df)
+        key = name.strip().upper()
+        df = _prepare_sheet(key, df)
+        prev = wb["previous"].pop(name, None)
+        with timed("index", sheet=name):
+            patched, summary = _apply_sheet_diff(key, prev, df) if prev is not None else (None, None)
+            if patched is not None:
+                df, wb["indexes"][key], values = patched
+                if values is not None:
+                    wb["value_indexes"][key] = values
+            else:
+                wb["indexes"][key] = build_indexes(key, df)
+                if key in VALUE_INDEX_SHEETS:
+                    wb["value_indexes"][key] = _build_value_index(df)
+                summary = summary or {"mode": "rebuild" if prev is not None else "load"}
+            summary["rows"] = len(df)
+        if COMPACT_SHEETS:
+            before = int(df.memory_usage(deep=True).sum())
+            df = _compact_sheet(key, df)
+            wb["memory"][name] = {"before_bytes": before, "after_bytes": int(df.memory_usage(deep=True).sum())}
+            log.info(json.dumps({"event": "sheet_compacted", "sheet": name, **wb["memory"][name]}))
+        wb["changes"][name] = summary
+        log.info(json.dumps({"event": "sheet_loaded", "source": wb["source_name"], "sheet": name,
+                             "version": wb["version"][:12], **summary}))
+        wb["sheets"][name] = df
+    return df
+
+def _install_workbook(state: dict, wb: dict) -> dict:
+    old = state["workbook"]
+    if old is not None:
+        with old["lock"]:
+            wb["previous"] = {
+                name: (df, old["indexes"].get(name.strip().upper(), {}),
+                       old["value_indexes"].get(name.strip().upper()))
+                for name, df in old["sheets"].items()
+            }
+        # listy načítané v starej verzii sa zaplátajú hneď (ešte pred výmenou): staré rámce sa uvoľnia
+        # po refreshi, nie až pri ďalšom dotaze na list, a prvé dotazy po výmene nečakajú na parse
+        for name in list(wb["previous"]):
+            if name in wb["sheet_names"]:
+                _load_sheet(wb, name)
+        wb["previous"].clear()
+    state["sha256"] = wb["version"]
+    state["workbook"] = wb  # atomická výmena, rozbehnuté dotazy dobehnú nad starou verziou
+    _evict_results(state["name"], wb["version"])
+    if _watch["refs"].get(state["name"]):
+        _watch_pool.submit(_check_watchlist, state["name"], wb)  # porovnanie mimo refresh cesty
+    return wb
+
+def _adopt_shared_workbook(state: dict) -> dict | None:
+    # iný proces overil workbook pred menej ako TTL -> bez sťahovania prevezmeme jeho verziu
+    checked_at = _read_shared_checked(state["cache_dir"])
+    if time.time() - checked_at > state["ttl"]:
+        return None
+    cached = _read_disk_manifest(state["cache_dir"])
+    if cached is None:
+        return None
+    manifest, content = cached
+    state["checked_at"] = checked_at
+    state["etag"], state["last_modified"] = manifest["etag"], manifest["last_modified"]
+    if manifest["version"] == state["sha256"] and state["workbook"] is not None:
+        return state["workbook"]
+    return _install_workbook(state, _new_workbook(state, manifest["version"], manifest["sheet_names"], content,
+                                                  fmt=manifest["format"], sheet_hint=manifest["sheet_hint"]))
+
+def _refresh_workbook(state: dict) -> dict:
+    # volať len pod state["refresh_lock"]; medzi procesmi serializuje fetch.lock
+    with _shared_lock(state["cache_dir"], "fetch.lock"):
+        adopted = _adopt_shared_workbook(state)
+        if adopted is not None:
+            return adopted
+        with timed("fetch", source=state["name"]):
+            fetched = _fetch_bytes(state["url"], conditional=state["workbook"] is not None, state=state)
+        state["checked_at"] = time.time()
+        state["error"] = None
+        if fetched is None:
+            _mark_shared_checked(state["cache_dir"], state["checked_at"])
+            return state["workbook"]  # 304 -> súbor sa nezmenil
+        content, digest = fetched
+        if digest == state["sha256"] and state["workbook"] is not None:
+            _mark_shared_checked(state["cache_dir"], state["checked_at"])
+            return state["workbook"]  # rovnaký obsah -> netreba znova parsovať
+        fmt = state["format"] if state["format"] != "auto" else _detect_format(content, state["content_type"], state["url"])
+        hint = _sheet_hint(state)
+        with timed("parse", sheet=None, source=state["name"], format=fmt):
+            reader = _open_source(fmt, content, hint)
+        wb = _new_workbook(state, digest, reader["sheet_names"], content, reader, fmt, hint)
+        _write_disk_manifest(state["cache_dir"], digest, content, wb["sheet_names"], state["etag"], state["last_modified"],
+                             fmt, hint)
+        _mark_shared_checked(state["cache_dir"], state["checked_at"])
+        return _install_workbook(state, wb)
+
+def _revalidate_in_background(state: dict) -> None:
+    try:
+        _refresh_workbook(state)
+    except Exception as exc:
+        state["checked_at"] = time.time()  # ďalší pokus až po TTL, dovtedy slúži stará verzia
+        state["error"] = str(exc)
+        log.warning("background workbook revalidation failed (source %s)", state["name"], exc_info=True)
+    finally:
+        state["refresh_lock"].release()
+
+def _start_background_refresh(state: dict) -> None:
+    # ak už refresh zdroja beží, pridáme sa k nemu (nič nespúšťame)
+    if state["refresh_lock"].acquire(blocking=False):
+        _refresh_pool.submit(_revalidate_in_background, state)
+
+def _load_initial_workbook(state: dict) -> None:
+    cached = _read_disk_manifest(state["cache_dir"])
+    if cached is None:
+        _refresh_workbook(state)
+        return
+    # studený štart: okamžite z disku, čerstvosť overí prvý refresh na pozadí
+    manifest, content = cached
+    state["etag"], state["last_modified"] = manifest["etag"], manifest["last_modified"]
+    _install_workbook(state, _new_workbook(state, manifest["version"], manifest["sheet_names"], content,
+                                           fmt=manifest["format"], sheet_hint=manifest["sheet_hint"]))
+
+def _cold_backoff(state: dict) -> float:
+    # sekundy do ďalšieho povoleného studeného pokusu (0 = skúsiť hneď)
+    if not state["fail_streak"]:
+        return 0.0
+    window = min(2.0 ** (state["fail_streak"] - 1), SOURCE_RETRY_MAX)
+    return max(0.0, state["failed_at"] + window - time.time())
+
+def _unavailable(state: dict) -> IOError:
+    return IOError(f"Source '{state['name']}' is unavailable: {state['error']}")
+
+def load_excel(source: str | None = None):
+    # source = názov zdroja zo SOURCES, None = predvolený
+    state = _source_state(source)
+    if state["workbook"] is None:
+        # nedostupný zdroj počas backoffu nesťahujeme vôbec
+        generation = state["failures"]
+        if _cold_backoff(state) > 0:
+            raise _unavailable(state) from state["failure"]
+        # nie je čo servírovať -> blokujúce načítanie, súbežné sessions čakajú na to isté
+        with state["refresh_lock"]:
+            if state["workbook"] is None:
+                if state["failures"] != generation:
+                    # single-flight aj pri chybe: pokus, na ktorý sme čakali, zlyhal -> jeho chyba, nie nový GET
+                    raise _unavailable(state) from state["failure"]
+                try:
+                    _load_initial_workbook(state)
+                except Exception as exc:
+                    state.update(error=str(exc), failure=exc, failed_at=time.time(),
+                                 failures=state["failures"] + 1, fail_streak=state["fail_streak"] + 1)
+                    raise
+                state["fail_streak"] = 0
+    if time.time() - state["checked_at"] > state["ttl"]:
+        _start_background_refresh(state)
+    return state["workbook"]
+
+def _cold_load(state: dict):
+    # jeden future na studený zdroj: súbežní volajúci čakajú na ten istý pokus a nezaberajú ďalšie miesta v poole
+    with state["cold_lock"]:
+        future = state["cold_load"]
+        if future is None or future.done():
+            future = state["cold_load"] = _fetch_pool.submit(load_excel, state["name"])
+    return future
+
+def load_workbooks(sources: list | None = None) -> dict:
+    # teplé zdroje priamo (refresh po TTL beží na pozadí), studené paralelne v ohraničenom poole:
+    # čas = najpomalší studený zdroj, nie súčet; zlyhaný zdroj vráti None a ostatné to neovplyvní
+    # zdroj v backoffe po zlyhaní vráti None hneď a nezaberie miesto v poole
+    names = list(sources or _sources)
+    states = {name: _source_state(name) for name in names}
+    backing_off = {name for name, state in states.items() if state["workbook"] is None and _cold_backoff(state) > 0}
+    cold = [name for name, state in states.items() if state["workbook"] is None and name not in backing_off]
+    futures = {name: _cold_load(states[name]) for name in cold}
+    workbooks = {}
+    for name in names:
+        if name in backing_off:
+            workbooks[name] = None
+            continue
+        try:
+            workbooks[name] = futures[name].result() if name in futures else load_excel(name)
+        except Exception:
+            log.warning("workbook load failed (source %s)", name, exc_info=True)
+            workbooks[name] = None
+    return workbooks
+
+def source_status() -> list:
+    # stav zdrojov pre debug panel / API: verzia, posledné overenie, posledná chyba
+    return [
+        {"source": name, "ttl": state["ttl"],
+         "version": state["sha256"][:12] if state["sha256"] else None,
+         "checked_at": state["checked_at"] or None, "error": state["error"]}
+        for name, state in _sources.items()
+    ]
+
+def get_sheet_by_name(wb: dict, wanted: str):
+    w = wanted.strip().upper()
+    for name in wb["sheet_names"]:
+        if name.strip().upper() == w:
+            return _load_sheet(wb, name)
+    return None
+
+def change_summary(source: str | None = None) -> dict:
+    # súhrn zmien poslednej verzie workbooku voči predchádzajúcej (per načítaný list)
+    wb = _source_state(source)["workbook"]
+    if wb is None:
+        return {}
+    return {"version": wb["version"], "sheets": dict(wb["changes"])}
+
+# --- QUERIES (presné routovanie na listy; vracia dáta, nič nerenderuje) ---
+# prefix dotazu -> (list, kľúčové stĺpce, fallback na "ľubovoľný stĺpec" pri nezhode kľúča, hláška pri nezhode)
+QUERY_KINDS = {
+    "STATUS": ("STATUS", ["Reference"], False, "No matching reference found in 'STATUS'."),
+    "ACCOUNT": ("ACCOUNT", ["Account"], True, "No matching account in 'ACCOUNT'."),
+    "CLIENT/ACCOUNT": ("CLIENTACCOUNT", ["Account"], True, "No matching account info in 'CLIENTACCOUNT'."),
+    "CLIENT": ("CLIENT", ["Client ID", "ClientID", "Client"], False, "No matching client in 'CLIENT'."),
+}
+INVALID_QUERY = "Please enter a valid query like STATUS …, CLIENT …, ACCOUNT …, CLIENT/ACCOUNT … or VIEW …"
+
+def parse_query(q: str) -> tuple[str | None, str]:
+    for kind in QUERY_KINDS:
+        if q.startswith(kind + " "):
+            return kind, q[len(kind) + 1:].strip()
+    if q.startswith("VIEW "):
+        return "VIEW", q[len("VIEW "):].strip()
+    if q.replace(" ", "").upper() == "TRADELIST":
+        return "TRADELIST", ""
+    return None, ""
+
+def _match_positions(wb: dict, kind: str, df: pd.DataFrame, val: str) -> tuple[list, str]:
+    sheet, key_cols, fallback_on_miss, _ = QUERY_KINDS[kind]
+    cols = [c for c in key_cols if c in df.columns]
+    key_index = wb["indexes"].get(sheet, {})
+    positions = []
+    for c in cols:
+        positions.extend(key_index.get(c, {}).get(val, []))
+    if kind == "STATUS":
+        return (positions[:1] if "Status" in df.columns else []), "key"  # STATUS vracia prvú zhodu
+    if not cols or (not positions and fallback_on_miss):
+        # rovnaké riadky v rovnakom poradí ako df[df.apply(lambda x: val in x.values, axis=1)]
+        return list(wb["value_indexes"].get(sheet, {}).get(val, [])), "any column"
+    return positions, "key"
+
+# --- AUTOCOMPLETE (prefixové návrhy z utriedeného poľa kľúčov, raz na verziu workbooku) ---
+def _prefix_index(wb: dict, sheet: str, key_cols: list) -> tuple[list, list]:
+    cached = wb["prefix_indexes"].get(sheet)
+    if cached is not None:
+        return cached
+    with wb["lock"]:
+        if sheet not in wb["prefix_indexes"]:
+            df = get_sheet_by_name(wb, sheet)
+            key_index = wb["indexes"].get(sheet, {})
+            with timed("index", sheet=sheet, index="prefix"):
+                # kľúče už sú v indexe -> bez skenu DataFrame; bez ohľadu na veľkosť písmen
+                values = {str(v) for c in key_cols if df is not None and c in df.columns for v in key_index.get(c, {})}
+                pairs = sorted((v.upper(), v) for v in values)
+                wb["prefix_indexes"][sheet] = ([p[0] for p in pairs], [p[1] for p in pairs])
+    return wb["prefix_indexes"][sheet]
+
+def suggest(query: str, wb: dict | None = None, limit: int | None = None, source: str | None = None) -> dict:
+    # "ACCOUNT 147572INET/" -> prvých `limit` kľúčov s týmto prefixom (binárne vyhľadanie)
+    wb = wb or load_excel(source)
+    kind, prefix = parse_query(query.lstrip())
+    result = {"query": query, "kind": kind, "prefix": prefix, "suggestions": [], "total": 0,
+              "version": wb["version"], "source": wb["source_name"]}
+    if kind not in QUERY_KINDS:
+        return result
+    limit = max(1, min(limit or SUGGEST_LIMIT, SUGGEST_MAX_LIMIT))
+    sheet, key_cols, _, _ = QUERY_KINDS[kind]
+    folded, values = _prefix_index(wb, sheet, key_cols)
+    with timed("lookup", query="SUGGEST"):
+        p = prefix.upper()
+        lo = bisect.bisect_left(folded, p)
+        hi = bisect.bisect_left(folded, p + "\U0010ffff")
+        result["suggestions"] = values[lo:min(hi, lo + limit)]
+        result["total"] = hi - lo
+    return result
+
+# --- TRADELIST (stránkovanie, triedenie, filter a projekcia stĺpcov na serveri) ---
+def _sort_order(wb: dict, sheet: str, df: pd.DataFrame, col, descending: bool) -> np.ndarray:
+    key = (sheet, col, descending)
+    order = wb["sort_orders"].get(key)
+    if order is None:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)  # poradie kategórií nemusí byť abecedné
+        numeric = pd.to_numeric(values, errors="coerce")
+        if numeric.notna().sum() == values.notna().sum():
+            values = numeric  # čisto číselný stĺpec triedime ako čísla, nie ako text
+        order = (
+            pd.DataFrame({"v": values.to_numpy(), "p": np.arange(len(df))})
+            .sort_values("v", ascending=not descending, kind="stable", na_position="last")["p"]
+            .to_numpy()
+        )
+        wb["sort_orders"][key] = order
+    return order
+
+def tradelist_page(wb: dict, df: pd.DataFrame, page: int = 1, page_size: int = TRADELIST_PAGE_SIZE,
+                   sort_by=None, descending: bool = False, filter_text: str = "", columns=None) -> tuple[pd.DataFrame, dict]:
+    # vráti len jednu stránku (bez kópie celého listu) + info o stránkovaní
+    columns = [c for c in (columns or []) if c in df.columns] or list(df.columns)
+    if sort_by in df.columns:
+        positions = _sort_order(wb, "TRADELIST", df, sort_by, descending)
+    else:
+        positions = np.arange(len(df))
+    if filter_text:
+        mask = np.zeros(len(df), dtype=bool)
+        for c in columns:
+            mask |= df[c].str.contains(filter_text, case=False, regex=False, na=False).to_numpy(dtype=bool)
+        positions = positions[mask[positions]]
+    page_size = min(max(1, int(page_size)), TRADELIST_MAX_PAGE_SIZE)
+    pages = max(1, -(-len(positions) // page_size))
+    page = min(max(1, int(page)), pages)
+    chunk = positions[(page - 1) * page_size:page * page_size]
+    rows = df.iloc[chunk, [df.columns.get_loc(c) for c in columns]]
+    return rows, {"page": page, "pages": pages, "page_size": page_size, "total": len(positions)}
+
+# --- CLIENT VIEW (klient -> client-accounts -> accounts -> STATUS, raz na verziu workbooku) ---
+VIEW_SHEETS = ["CLIENT", "CLIENTACCOUNT", "ACCOUNT", "STATUS"]
+
+def _merged_index(df: pd.DataFrame | None, cols: list) -> dict:
+    # hodnota -> pozície cez viac stĺpcov, v poradí stĺpcov (ako CLIENT dotaz)
+    merged = {}
+    if df is None:
+        return merged
+    for c in [c for c in cols if c in df.columns]:
+        for key, pos in _build_key_index(df, c).items():
+            merged.setdefault(key, []).extend(pos)
+    return merged
+
+def _build_client_view(wb: dict) -> dict:
+    client_cols = QUERY_KINDS["CLIENT"][1]
+    client_df, ca_df, acc_df, status_df = (get_sheet_by_name(wb, s) for s in VIEW_SHEETS)
+    by_client = _merged_index(client_df, client_cols)
+    ca_by_client = _merged_index(ca_df, client_cols)
+    acc_by_account = _merged_index(acc_df, ["Account"])
+    status_by_account = _merged_index(status_df, ["Account"])
+    ca_accounts = ca_df["Account"].to_numpy(dtype=object) if ca_df is not None and "Account" in ca_df.columns else None
+
+    view = {}
+    for client in by_client.keys() | ca_by_client.keys():
+        ca_pos = ca_by_client.get(client, [])
+        accounts = []
+        if ca_accounts is not None:
+            accounts = list(dict.fromkeys(a for a in ca_accounts[ca_pos] if isinstance(a, str)))
+        view[client] = {
+            "accounts": accounts,
+            "CLIENT": by_client.get(client, []),
+            "CLIENTACCOUNT": ca_pos,
+            "ACCOUNT": [p for a in accounts for p in acc_by_account.get(a, [])],
+            "STATUS": [p for a in accounts for p in status_by_account.get(a, [])],
+        }
+    return view
+
+def _client_view(wb: dict) -> dict:
+    view = wb["client_view"]
+    if view is not None:
+        return view
+    with wb["lock"]:
+        if wb["client_view"] is None:
+            with timed("index", sheet="VIEW"):
+                wb["client_view"] = _build_client_view(wb)
+    return wb["client_view"]
+
+# --- RESULT CACHE (LRU výsledkov per verzia workbooku; nová verzia staré položky zahodí) ---
+_result_cache = {"lock": threading.Lock(), "entries": OrderedDict(), "hits": 0, "misses": 0}
+
+def _result_key(wb: dict, kind: str, val: str, tradelist: dict) -> tuple:
+    opts = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in tradelist.items()))
+    return wb["source_name"], wb["version"], kind, val, opts
+
+def _evict_results(source_name: str, version: str) -> None:
+    cache = _result_cache
+    with cache["lock"]:
+        stale = [k for k in cache["entries"] if k[0] == source_name and k[1] != version]
+        for k in stale:
+            del cache["entries"][k]
+
+def result_cache_stats() -> dict:
+    cache = _result_cache
+    with cache["lock"]:
+        return {"hits": cache["hits"], "misses": cache["misses"], "entries": len(cache["entries"]),
+                "size": RESULT_CACHE_SIZE}
+
+def run_query(query: str, wb: dict | None = None, source: str | None = None, **tradelist) -> dict:
+    # výsledok: kind, sheet, ok, message (chyba), value (STATUS), rows (DataFrame), version, source;
+    # tradelist = voľby stránkovania pre TRADELIST (viď tradelist_page)
+    # výsledky sú zdieľané medzi volajúcimi -> DataFrame-y sa nemenia, len renderujú
+    wb = wb or load_excel(source)
+    q = query.strip()
+    kind, val = parse_query(q)
+    if kind is None or not RESULT_CACHE_SIZE:
+        return _run_query(wb, q, kind, val, tradelist)
+    cache = _result_cache
+    key = _result_key(wb, kind, val, tradelist)
+    with cache["lock"]:
+        result = cache["entries"].get(key)
+        if result is not None:
+            cache["entries"].move_to_end(key)
+            cache["hits"] += 1
+        else:
+            cache["misses"] += 1
+    if result is not None:
+        return {**result, "query": q}
+    result = _run_query(wb, q, kind, val, tradelist)
+    if _sources.get(wb["source_name"], {}).get("workbook") is not wb:
+        return result  # medzičasom prišla nová verzia -> výsledok starej neukladáme
+    with cache["lock"]:
+        cache["entries"][key] = result
+        while len(cache["entries"]) > RESULT_CACHE_SIZE:
+            cache["entries"].popitem(last=False)
+    return result
+
+def _run_query(wb: dict, q: str, kind: str | None, val: str, tradelist: dict) -> dict:
+    result = {"query": q, "kind": kind, "sheet": None, "ok": False, "message": None, "value": None,
+              "rows": None, "sections": None, "page": None, "version": wb["version"], "source": wb["source_name"]}
+    if kind is None:
+        result["message"] = INVALID_QUERY
+        return result
+
+    if kind == "VIEW":
+        # celá hierarchia klienta jedným lookupom v predpočítanom joine
+        view = _client_view(wb)
+        with timed("lookup", query=kind):
+            entry = view.get(val)
+            if entry is not None:
+                result["value"] = entry["accounts"]
+                result["sections"] = {
+                    sheet: get_sheet_by_name(wb, sheet).iloc[entry[sheet]]
+                    for sheet in VIEW_SHEETS if len(entry[sheet])
+                }
+        if not result["sections"]:
+            result["message"] = "No matching client for 'VIEW'."
+            return result
+        result["ok"] = True
+        return result
+
+    result["sheet"] = sheet = QUERY_KINDS[kind][0] if kind in QUERY_KINDS else "TRADELIST"
+    df = get_sheet_by_name(wb, sheet)
+    if df is None:
+        result["message"] = f"Sheet '{sheet}' not found."
+        return result
+
+    if kind == "TRADELIST":
+        with timed("lookup", query=kind):
+            rows, page = tradelist_page(wb, df, **tradelist)
+        result.update(ok=True, rows=rows, page=page)
+        return result
+
+    with timed("lookup", query=kind):
+        positions, _ = _match_positions(wb, kind, df, val)
+        rows = df.iloc[positions]
+    if rows.empty:
+        result["message"] = QUERY_KINDS[kind][3]
+        return result
+    result.update(ok=True, rows=rows)
+    if kind == "STATUS":
+        result["value"] = rows.iloc[0]["Status"]
+    return result
+
+def run_query_all(query: str, sources: list | None = None, **tradelist) -> list:
+    # rovnaký dotaz nad všetkými (alebo vybranými) zdrojmi; workbooky sa načítajú paralelne
+    results = []
+    for name, wb in load_workbooks(sources).items():
+        if wb is None:
+            kind, _ = parse_query(query.strip())
+            results.append({"query": query.strip(), "kind": kind, "sheet": None, "ok": False,
+                            "message": f"Source '{name}' is unavailable.", "value": None, "rows": None,
+                            "sections": None, "page": None, "version": None, "source": name})
+            continue
+        results.append(run_query(query, wb, **tradelist))
+    return results
+
+# --- BATCH (dotazy zoskupené podľa listu, jeden take na list) ---
+def read_batch_lines(text: str, upload) -> list:
+    lines = text.splitlines() if text else []
+    if upload is not None:
+        df = pd.read_csv(upload, dtype=str, header=None, skip_blank_lines=True).fillna("")
+        header = [c.strip().lower() for c in df.iloc[0]] if len(df) else []
+        if "query" in header:
+            lines.extend(df.iloc[1:, header.index("query")].tolist())
+        else:
+            lines.extend(df.iloc[:, 0].tolist())
+    return lines
+
+def resolve_batch(wb: dict, lines: list) -> pd.DataFrame:
+    # rovnaké pravidlá zhody ako run_query, ale jeden df.iloc na celú skupinu
+    groups = {kind: [] for kind in QUERY_KINDS}
+    misses = []  # (poradie, dotaz, list, dôvod)
+    for n, line in enumerate(lines):
+        q = line.strip()
+        if not q:
+            continue
+        kind, val = parse_query(q)
+        if kind not in groups:
+            misses.append((n, q, None, "invalid query"))
+        else:
+            groups[kind].append((n, q, val))
+
+    frames = []
+    for kind, (sheet, _, _, _) in QUERY_KINDS.items():
+        items = groups[kind]
+        if not items:
+            continue
+        df = get_sheet_by_name(wb, sheet)
+        if df is None:
+            misses.extend((n, q, sheet, "sheet not found") for n, q, _ in items)
+            continue
+        positions, order, queries, how = [], [], [], []
+        for n, q, val in items:
+            pos, match = _match_positions(wb, kind, df, val)
+            if not pos:
+                misses.append((n, q, sheet, "not found"))
+                continue
+            positions.extend(pos)
+            order.extend([n] * len(pos))
+            queries.extend([q] * len(pos))
+            how.extend([match] * len(pos))
+        if positions:
+            rows = df.iloc[positions].reset_index(drop=True)
+            rows.insert(0, "match", how)
+            rows.insert(0, "sheet", sheet)
+            rows.insert(0, "query", queries)
+            rows.insert(0, "_order", order)
+            frames.append(rows)
+
+    if misses:
+        frames.append(pd.DataFrame(misses, columns=["_order", "query", "sheet", "match"]))
+    if not frames:
+        return pd.DataFrame(columns=["query", "sheet", "match"])
+    result = pd.concat(frames, ignore_index=True).sort_values("_order", kind="stable")
+    return result.drop(columns="_order").reset_index(drop=True)
+
+# --- EXPORT (CSV/Parquet po blokoch priamo z cache rámcov, bez ďalšej celej kópie) ---
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+EXPORT_SHEETS = ["TRADELIST", "CLIENTACCOUNT"]  # celé listy na stiahnutie
+
+class _ChunkSink(io.RawIOBase):
+    # ParquetWriter sem zapisuje, iter_export po každom row group vyberie hotové bajty
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        self.written += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.written
+
+    def drain(self) -> bytes:
+        out, self.parts = b"".join(self.parts), []
+        return out
+
+def iter_export(df: pd.DataFrame, fmt: str, chunk_rows: int | None = None):
+    # generátor bajtov: v pamäti je naraz len jeden blok riadkov a jeho zakódovaný výstup
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'.")
+    chunk_rows = max(1, chunk_rows or EXPORT_CHUNK_ROWS)
+    if fmt == "csv":
+        yield df.iloc[:0].to_csv(index=False).encode("utf-8")  # hlavička aj pre prázdny výsledok
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode("utf-8")
+        return
+    if pa is None:
+        raise ValueError("Parquet export needs pyarrow.")
+    import pyarrow.parquet as pq
+    names = [str(c) for c in df.columns]
+    schema = pa.Schema.from_pandas(df.iloc[:0].set_axis(names, axis=1), preserve_index=False)
+    # prázdny object stĺpec by dostal typ null -> ďalšie bloky s textom by neprešli
+    schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in schema],
+                       metadata=schema.metadata)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            part = df.iloc[start:start + chunk_rows].set_axis(names, axis=1)
+            writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()  # footer
+
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    # pre st.download_button (chce celé bajty); veľké exporty radšej cez API /export (stream)
+    with timed("render", query="EXPORT", format=fmt, rows=len(df)):
+        return b"".join(iter_export(df, fmt))
+
+def export_frames(res: dict) -> dict:
+    # výsledok dotazu -> {názov: DataFrame} na export (VIEW má sekciu per list)
+    if not res["ok"]:
+        return {}
+    if res["sections"] is not None:
+        return dict(res["sections"])
+    return {res["sheet"] or res["kind"]: res["rows"]} if res["rows"] is not None else {}
+
+# --- WATCHLIST (sledované STATUS referencie; po každej novej verzii lookup v kľúčovom indexe, nie sken) ---
+_watch = {
+    "lock": threading.Lock(),
+    "refs": {name: {r.strip() for r in WATCHLIST.split(",") if r.strip()} for name in _sources},
+    "last": {},  # (zdroj, referencia) -> posledný známy Status (None = referencia zmizla)
+    "feed": deque(maxlen=WATCH_FEED_SIZE),
+    "seq": 0,
+}
+
+def _statuses(wb: dict, refs: set) -> dict:
+    df = get_sheet_by_name(wb, "STATUS")
+    if df is None or "Status" not in df.columns:
+        return dict.fromkeys(refs)
+    out = {}
+    for ref in refs:
+        positions, _ = _match_positions(wb, "STATUS", df, ref)
+        value = df["Status"].iloc[positions[0]] if positions else None
+        out[ref] = None if value is None or pd.isna(value) else str(value)
+    return out
+
+def _check_watchlist(source_name: str, wb: dict) -> None:
+    watch = _watch
+    if _sources[source_name]["workbook"] is not wb:
+        return  # medzičasom prišla novšia verzia, porovná sa tá
+    try:
+        with watch["lock"]:
+            refs = set(watch["refs"].get(source_name, ()))
+        with timed("lookup", query="WATCH", source=source_name, size=len(refs)):
+            current = _statuses(wb, refs)
+        events = []
+        at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        with watch["lock"]:
+            for ref, status in current.items():
+                key = (source_name, ref)
+                if key not in watch["last"]:
+                    watch["last"][key] = status  # prvé pozorovanie = základ, nie zmena
+                    continue
+                if watch["last"][key] == status:
+                    continue
+                watch["seq"] += 1
+                events.append({"id": watch["seq"], "at": at, "source": source_name, "reference": ref,
+                               "old": watch["last"][key], "new": status, "version": wb["version"][:12]})
+                watch["last"][key] = status
+            watch["feed"].extend(events)
+        for event in events:
+            log.info(json.dumps({"event": "watch_change", **event}))
+        if events and WATCH_WEBHOOK_URL:
+            _session.post(WATCH_WEBHOOK_URL, json={"events": events},
+                          timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT)).raise_for_status()
+    except Exception:
+        log.warning("watchlist check failed (source %s)", source_name, exc_info=True)
+
+def watch_add(refs: list, source: str | None = None) -> None:
+    # nové referencie dostanú základný Status hneď, ak je workbook v pamäti
+    state = _source_state(source)
+    with _watch["lock"]:
+        _watch["refs"].setdefault(state["name"], set()).update(r.strip() for r in refs if r.strip())
+    if state["workbook"] is not None:
+        _check_watchlist(state["name"], state["workbook"])
+
+def watch_remove(refs: list, source: str | None = None) -> None:
+    name = _source_state(source)["name"]
+    with _watch["lock"]:
+        for ref in (r.strip() for r in refs):  # rovnako ako watch_add
+            _watch["refs"].get(name, set()).discard(ref)
+            _watch["last"].pop((name, ref), None)
+
+def watchlist(source: str | None = None) -> list:
+    # [{source, reference, status}] podľa posledného porovnania
+    names = [_source_state(source)["name"]] if source is not None else list(_sources)
+    with _watch["lock"]:
+        return [
+            {"source": name, "reference": ref, "status": _watch["last"].get((name, ref))}
+            for name in names for ref in sorted(_watch["refs"].get(name, ()))
+        ]
+
+def watch_feed(since: int = 0) -> list:
+    # zmeny novšie ako `since` (id), najnovšie posledné -> klienti pollujú lacno
+    with _watch["lock"]:
+        return [e for e in _watch["feed"] if e["id"] > since]
+
+# --- WARMUP (pri štarte procesu: stiahnuť, rozparsovať a zaindexovať skôr, než príde prvý používateľ) ---
+_warmup = {"lock": threading.Lock(), "state": "idle", "started_at": None, "seconds": None, "attempts": 0}
+
+def _warm_workbook(wb: dict) -> None:
+    # všetky listy + indexy, VIEW join a prefixové indexy -> prvý dotaz už nič nestavia
+    # chyba sa len zaloguje: workbook je načítaný, čo sa nepostavilo teraz, postaví prvý dotaz
+    try:
+        for name in wb["sheet_names"]:
+            get_sheet_by_name(wb, name)
+        _client_view(wb)
+        for sheet, key_cols, _, _ in QUERY_KINDS.values():
+            _prefix_index(wb, sheet, key_cols)
+    except Exception:
+        log.warning("warmup of source %s failed", wb["source_name"], exc_info=True)
+
+def warmup(sources: list | None = None) -> dict:
+    start = time.perf_counter()
+    workbooks = load_workbooks(sources)
+    loaded = [wb for wb in workbooks.values() if wb is not None]
+    # zdroje sa zahrievajú paralelne v poole pre prácu na pozadí
+    for _ in _refresh_pool.map(_warm_workbook, loaded):
+        pass
+    seconds = round(time.perf_counter() - start, 3)
+    log.info(json.dumps({"event": "warmup_done", "seconds": seconds,
+                         "sources": {name: wb is not None for name, wb in workbooks.items()}}))
+    return workbooks
+
+def _run_warmup() -> None:
+    # opakuje sa, kým sa nenačíta aspoň jeden zdroj: výpadok upstreamu pri štarte by inak nechal /ready
+    # na 503 navždy (load balancer nepošle traffic, takže načítanie nespustí ani prvý dotaz)
+    state = _warmup
+    delay = 1.0
+    while True:
+        state["attempts"] += 1
+        try:
+            workbooks = warmup()
+        except Exception:
+            workbooks = {}
+            log.warning("warmup failed", exc_info=True)
+        state["seconds"] = round(time.time() - state["started_at"], 3)
+        # úspech = aspoň jeden načítaný workbook (chyby pri zahrievaní indexov ho nezhodia)
+        if any(wb is not None for wb in workbooks.values()):
+            state["state"] = "done"
+            return
+        state["state"] = "failed"
+        log.warning(json.dumps({"event": "warmup_retry", "attempt": state["attempts"], "retry_in": delay}))
+        time.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX)
+
+def start_warmup() -> None:
+    # volá sa pri každom rerune Streamlit skriptu / štarte API -> beží len raz na proces
+    state = _warmup
+    if not WARMUP:
+        return
+    with state["lock"]:
+        if state["state"] != "idle":
+            return
+        state["state"] = "running"
+        state["started_at"] = time.time()
+    threading.Thread(target=_run_warmup, daemon=True, name="warmup").start()
+
+def readiness() -> dict:
+    # pre load balancer: pripravené = warmup dobehol a aspoň jeden zdroj má workbook v pamäti
+    # (bez WARMUP je proces pripravený hneď, workbook sa načíta pri prvom dotaze)
+    state = _warmup
+    loaded = {name: s["workbook"] is not None for name, s in _sources.items()}
+    ready = not WARMUP or (state["state"] in ("done", "failed") and any(loaded.values()))
+    return {"ready": ready, "warmup": state["state"], "warmup_seconds": state["seconds"],
+            "warmup_attempts": state["attempts"], "sources": loaded}
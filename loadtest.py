@@ -0,0 +1,261 @@
+# --- LOAD TEST (veľa súbežných sessions proti lokálnemu stubu namiesto EXCEL_URL) ---
+# python loadtest.py --sessions 50 --duration 120 --ttl 15 --change-every 30 --out load.json
+# python loadtest.py --mode api --sessions 200 --think 0.2     (cez JSON API, keep-alive spojenie per session)
+# session = jeden používateľ: dotaz (rerun skriptu), pauza --think, ďalší dotaz; TTL krátke, aby test prešiel
+# viacerými expiráciami cache a zmenami workbooku (--change-every) ako v produkcii za hodiny
+import argparse, hashlib, http.client, json, logging, os, platform, random, sys, threading, time
+from urllib.parse import urlencode
+import pandas as pd
+import engine
+import bench
+
+# realistický mix dotazov (váhy); kľúče náhodné, časť z malej "horúcej" množiny
+QUERY_MIX = {"STATUS": 40, "ACCOUNT": 25, "CLIENT": 10, "CLIENT/ACCOUNT": 5, "VIEW": 5, "TRADELIST": 15}
+HOT_KEYS = 100
+
+def make_query(kind: str, rows: int, rng: random.Random, hot: float) -> tuple[str, dict]:
+    accounts = max(rows // 10, 1)
+    clients = max(rows // 100, 1)
+    pick = lambda n: rng.randrange(min(n, HOT_KEYS)) if rng.random() < hot else rng.randrange(n)
+    if kind == "STATUS":
+        # ~5 % preklepov -> nezhoda a návrhy
+        return ("STATUS REF%07d" % pick(rows)) if rng.random() > 0.05 else "STATUS NOPE%d" % rng.randrange(1000), {}
+    if kind == "ACCOUNT":
+        return "ACCOUNT ACC%06d" % pick(accounts), {}
+    if kind == "CLIENT":
+        return "CLIENT CL%05d" % pick(clients), {}
+    if kind == "CLIENT/ACCOUNT":
+        return "CLIENT/ACCOUNT ACC%06d" % pick(accounts), {}
+    if kind == "VIEW":
+        return "VIEW CL%05d" % pick(clients), {}
+    opts = {"page": rng.randint(1, 5)}
+    if rng.random() < 0.3:
+        opts.update(sort_by=rng.choice(["Qty", "Price", "Account"]), descending=rng.random() < 0.5)
+    if rng.random() < 0.2:
+        opts["filter_text"] = rng.choice(["GBPUSD", "AAPL", "ACC0001"])
+    return "TRADELIST", opts
+
+# --- KLIENTI (engine = ako rerun Streamlit skriptu v threade session; api = HTTP na /query) ---
+def engine_client():
+    def call(query: str, opts: dict) -> bool:
+        # rovnaké volania ako app.py: load_selected() -> handle_query() -> run_query()
+        wb = engine.load_workbooks([engine.DEFAULT_SOURCE])[engine.DEFAULT_SOURCE]
+        if wb is None:
+            return False
+        res = engine.run_query(query, wb, **opts)
+        if not res["ok"] and res["kind"] in engine.QUERY_KINDS:
+            engine.suggest(query, wb)
+        return True
+    return call
+
+def api_client(port: int, token: str):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    def call(query: str, opts: dict) -> bool:
+        params = {"q": query}
+        if "page" in opts:
+            params["page"] = opts["page"]
+        if opts.get("sort_by"):
+            params.update(sort=opts["sort_by"], desc=int(opts["descending"]))
+        if opts.get("filter_text"):
+            params["filter"] = opts["filter_text"]
+        conn.request("GET", "/query?" + urlencode(params), headers=headers)
+        r = conn.getresponse()
+        r.read()
+        return r.status < 500
+    return call
+
+# --- MERANIE ---
+class Recorder:
+    # latencie od posledného intervalu + celkové; zapisujú všetky sessions
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.interval = []
+        self.total = {}  # druh dotazu -> latencie v ms
+        self.errors = 0
+        self.interval_errors = 0
+
+    def add(self, kind: str, ms: float, ok: bool):
+        with self.lock:
+            self.interval.append(ms)
+            self.total.setdefault(kind, []).append(ms)
+            if not ok:
+                self.errors += 1
+                self.interval_errors += 1
+
+    def drain(self) -> tuple[list, int]:
+        with self.lock:
+            out, errors = self.interval, self.interval_errors
+            self.interval, self.interval_errors = [], 0
+        return out, errors
+
+def percentiles(times: list) -> dict:
+    # nearest-rank; prázdny interval (napr. všetky sessions čakajú na refresh) = None
+    if not times:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    s = sorted(times)
+    at = lambda p: round(s[min(len(s) - 1, int(p / 100.0 * len(s)))], 3)
+    return {"p50_ms": at(50), "p95_ms": at(95), "p99_ms": at(99), "max_ms": round(s[-1], 3)}
+
+def rss_mb() -> float:
+    # aktuálne RSS z /proc (Linux), inak maximum z getrusage
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+    except OSError:
+        import resource  # nie je na Windows
+        scale = 1 if sys.platform == "darwin" else 1024
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6, 1)
+
+def session(i: int, call, rows: int, args, recorder: Recorder, stop: threading.Event):
+    rng = random.Random(args.seed + i)
+    kinds, weights = list(QUERY_MIX), list(QUERY_MIX.values())
+    stop.wait(rng.uniform(0, args.ramp))  # postupný nábeh sessions
+    while not stop.is_set():
+        kind = rng.choices(kinds, weights)[0]
+        query, opts = make_query(kind, rows, rng, args.hot)
+        t0 = time.perf_counter()
+        try:
+            ok = call(query, opts)
+        except Exception:
+            log.debug("session %d query failed", i, exc_info=True)
+            ok = False
+        recorder.add(kind, (time.perf_counter() - t0) * 1000.0, ok)
+        stop.wait(rng.expovariate(1.0 / args.think) if args.think > 0 else 0)
+
+def publish(body: bytes) -> None:
+    # nová verzia workbooku na stube (nové ETag -> ďalší refresh stiahne a parsuje)
+    bench._StubHandler.body = body
+    bench._StubHandler.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+
+def run(args) -> dict:
+    bodies = [bench.make_source(args.rows, args.format)]
+    if args.change_every:
+        bodies.append(bench.make_source(args.rows + 1, args.format))  # druhá verzia: o riadok viac
+    server = bench.start_stub(bodies[0])
+    engine._state["url"] = f"http://127.0.0.1:{server.server_port}/workbook.{args.format}"
+    engine._state.update(cache_dir=args.cache_dir, ttl=args.ttl)
+
+    t0 = time.perf_counter()
+    if not args.cold:
+        engine.warmup()
+    warmup_s = round(time.perf_counter() - t0, 3)
+
+    api_server = None
+    if args.mode == "api":
+        import api
+        api_server = api.make_server("127.0.0.1", 0)
+        threading.Thread(target=api_server.serve_forever, daemon=True).start()
+        clients = [api_client(api_server.server_port, api.API_TOKEN) for _ in range(args.sessions)]
+    else:
+        clients = [engine_client() for _ in range(args.sessions)]
+
+    recorder, stop = Recorder(), threading.Event()
+    threads = [threading.Thread(target=session, args=(i, clients[i], args.rows, args, recorder, stop), daemon=True)
+               for i in range(args.sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+
+    intervals, published, version = [], 0, engine._state["sha256"]
+    next_change = args.change_every or float("inf")
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            stop.wait(min(args.interval, max(args.duration - elapsed, 0)))
+            elapsed = time.perf_counter() - start
+            if elapsed >= next_change:
+                published += 1
+                publish(bodies[published % len(bodies)])
+                next_change += args.change_every
+            times, errors = recorder.drain()
+            # refresh = workbook sa v intervale vymenil (expirácia TTL + nový obsah na stube)
+            refreshed = engine._state["sha256"] != version
+            version = engine._state["sha256"]
+            point = {"t_s": round(elapsed, 1), "requests": len(times), "rps": round(len(times) / args.interval, 1),
+                     "errors": errors, **percentiles(times), "rss_mb": rss_mb(),
+                     "version": version[:12] if version else None, "refreshed": refreshed}
+            intervals.append(point)
+            log.info(json.dumps(point))
+            if elapsed >= args.duration:
+                break
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=30)
+        if api_server is not None:
+            api_server.shutdown()
+        server.shutdown()
+        server.server_close()
+
+    duration = time.perf_counter() - start
+    everything = [ms for times in recorder.total.values() for ms in times]
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "mode": args.mode,
+            "sessions": args.sessions,
+            "think_s": args.think,
+            "rows": args.rows,
+            "source_format": args.format,
+            "ttl_s": args.ttl,
+            "change_every_s": args.change_every,
+            "result_cache_size": engine.RESULT_CACHE_SIZE,
+            "compact_sheets": engine.COMPACT_SHEETS,
+            "warmup_s": warmup_s,
+        },
+        "summary": {
+            "requests": len(everything),
+            "rps": round(len(everything) / duration, 1),
+            "errors": recorder.errors,
+            **percentiles(everything),
+            "peak_rss_mb": max((p["rss_mb"] for p in intervals), default=rss_mb()),
+            "versions_published": published + 1,
+            "refreshes_seen": sum(p["refreshed"] for p in intervals),
+            "result_cache": engine.result_cache_stats(),
+            "by_kind": {kind: {"requests": len(times), **percentiles(times)} for kind, times in recorder.total.items()},
+        },
+        "intervals": intervals,
+    }
+
+log = logging.getLogger("b2b.saxo.loadtest")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Drive concurrent sessions with a realistic query mix and report "
+                                                 "throughput, latency percentiles and memory over time.")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--think", type=float, default=1.0, help="mean pause between a session's queries in seconds")
+    parser.add_argument("--mode", default="engine", choices=["engine", "api"],
+                        help="engine = in-process like Streamlit script threads, api = HTTP to the JSON API")
+    parser.add_argument("--rows", type=int, default=100000, help="STATUS/TRADELIST rows of the synthetic workbook")
+    parser.add_argument("--format", default="xlsx", choices=["xlsx", "zip", "json"])
+    parser.add_argument("--ttl", type=float, default=15.0, help="workbook TTL during the test (production: 300)")
+    parser.add_argument("--change-every", type=float, default=30.0,
+                        help="publish a new workbook version every N seconds (0 = content never changes)")
+    parser.add_argument("--hot", type=float, default=0.2, help="share of lookups drawn from a small hot key set")
+    parser.add_argument("--interval", type=float, default=5.0, help="reporting interval in seconds")
+    parser.add_argument("--cache-dir", default="", help="SHEET_CACHE_DIR during the test (default off)")
+    parser.add_argument("--cold", action="store_true", help="skip the warmup, first sessions load the workbook")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="", help="write JSON results here (default stdout)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine.log.setLevel(logging.WARNING)  # bez JSON eventov z každej fázy
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if report["summary"]["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
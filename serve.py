@@ -0,0 +1,14 @@
+# --- SERVE (jeden proces: warmup + JSON API s /ready + Streamlit UI nad tou istou teplou cache) ---
+# python serve.py [--server.port 8501 ...]   (argumenty idú do `streamlit run`)
+import os, sys
+import api, engine
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+if __name__ == "__main__":
+    # warmup a API štartujú hneď so serverom, nie až s prvou session
+    engine.start_warmup()
+    api.start_in_background(api.API_PORT or 8502)
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", APP_PATH, *sys.argv[1:]]
+    sys.exit(cli.main())
@@ -0,0 +1,49 @@
+import os, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# testy importujú engine priamo z koreňa repozitára, bez disk cache, warmupu a HTTP retry
+# (počet GET na stub = počet pokusov engine)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SHEET_CACHE_DIR", "")
+os.environ.setdefault("WARMUP", "0")
+os.environ.setdefault("FETCH_RETRIES", "0")
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub["lock"]:
+            stub["hits"] += 1
+        # routes: cesta -> vlastné nastavenia (viac zdrojov na jednom stube)
+        stub = {**stub, **stub["routes"].get(self.path, {})}
+        time.sleep(stub["delay"])
+        body = stub["body"]
+        self.send_response(stub["status"])
+        # hlavička s hodnotou None sa nepošle (bez Content-Length končí body zatvorením spojenia)
+        headers = {"Content-Length": str(len(body)), **stub["headers"]}
+        for k, v in headers.items():
+            if v is not None:
+                self.send_header(k, v)
+        self.end_headers()
+        # truncate = pošle len časť body a zavrie spojenie (Content-Length nesedí)
+        self.wfile.write(body[:stub["truncate"]] if stub["truncate"] is not None else body)
+        if stub["truncate"] is not None or headers["Content-Length"] is None:
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    # lokálny upstream: status, body, hlavičky, oneskorenie a počet GET (všetky cesty) sa dajú meniť v teste
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    server.stub = {"lock": threading.Lock(), "hits": 0, "delay": 0.0, "status": 200, "body": b"",
+                   "headers": {}, "truncate": None, "routes": {},
+                   "url": f"http://127.0.0.1:{server.server_port}/x.json"}
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server.stub
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,54 @@
+# --- SŤAHOVANIE: limit veľkosti, neúplné body a SHA-256 digest; validátory len po dobrom body ---
+import base64, hashlib
+import pytest
+import engine
+
+BODY = b'{"STATUS": [{"Reference": "R1", "Status": "OK"}]}'
+
+def _fetch(stub, **headers):
+    stub.update(body=BODY)
+    stub["headers"].update({"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT", **headers})
+    state = engine._new_source_state("dl", stub["url"], float("inf"), "")
+    return state, lambda: engine._fetch_bytes(stub["url"], state=state)
+
+def _rejected(state, stub):
+    # odmietnuté sťahovanie nesmie zapísať validátory, inak by ďalší podmienený GET dostal 304
+    assert state["etag"] is None and state["last_modified"] is None and state["content_type"] is None
+    assert stub["hits"] == 1
+
+def test_good_body_with_digest_sets_validators(stub):
+    sha = hashlib.sha256(BODY)
+    state, fetch = _fetch(stub, **{"Repr-Digest": "sha-256=:%s:" % base64.b64encode(sha.digest()).decode()})
+    assert fetch() == (BODY, sha.hexdigest())
+    assert state["etag"] == '"v1"' and state["last_modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+def test_content_length_over_cap(monkeypatch, stub):
+    monkeypatch.setattr(engine, "FETCH_MAX_BYTES", len(BODY) - 1)
+    state, fetch = _fetch(stub)
+    with pytest.raises(ValueError, match="over FETCH_MAX_BYTES"):
+        fetch()
+    _rejected(state, stub)
+
+def test_streaming_cap_without_content_length(monkeypatch, stub):
+    monkeypatch.setattr(engine, "FETCH_MAX_BYTES", len(BODY) - 1)
+    monkeypatch.setattr(engine, "FETCH_CHUNK_BYTES", 8)
+    state, fetch = _fetch(stub, **{"Content-Length": None})
+    with pytest.raises(ValueError, match="download aborted"):
+        fetch()
+    _rejected(state, stub)
+
+def test_truncated_body(stub):
+    state, fetch = _fetch(stub)
+    stub["truncate"] = len(BODY) // 2
+    # urllib3 2 sám kontroluje Content-Length; ak nie, zachytí to _read_body -> vždy IOError
+    with pytest.raises(IOError):
+        fetch()
+    _rejected(state, stub)
+
+@pytest.mark.parametrize("header,value", [("Repr-Digest", "sha-256=:%s:"), ("Digest", "SHA-256=%s")])
+def test_digest_mismatch(stub, header, value):
+    wrong = base64.b64encode(hashlib.sha256(b"other").digest()).decode()
+    state, fetch = _fetch(stub, **{header: value % wrong})
+    with pytest.raises(IOError, match="SHA-256"):
+        fetch()
+    _rejected(state, stub)
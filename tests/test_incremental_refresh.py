@@ -0,0 +1,56 @@
+# --- INCREMENTAL REFRESH: záplata musí dať ten istý rámec a indexy ako čerstvé načítanie ---
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import engine
+
+def _accounts(rows: list) -> dict:
+    return {"ACCOUNT": [{"Account": a, "Client": c, "Currency": cur} for a, c, cur in rows]}
+
+def _workbook(state: dict, version: str, sheets: dict) -> dict:
+    content = json.dumps(sheets).encode("utf-8")
+    return engine._new_workbook(state, version, list(sheets), content, fmt="json")
+
+def _refresh(old: dict, new: dict):
+    # starý workbook načítaný, nový nainštalovaný nad ním (záplata) vs. ten istý nový súbor načítaný načisto
+    state = engine._new_source_state("t", "http://stub/x.json", float("inf"), "")
+    engine._install_workbook(state, _workbook(state, "v1", old))
+    engine.get_sheet_by_name(state["workbook"], "ACCOUNT")
+    patched = engine._install_workbook(state, _workbook(state, "v2", new))
+    fresh_state = engine._new_source_state("f", "http://stub/x.json", float("inf"), "")
+    fresh = engine._install_workbook(fresh_state, _workbook(fresh_state, "v2", new))
+    engine.get_sheet_by_name(fresh, "ACCOUNT")
+    return patched, fresh
+
+def _assert_same(patched: dict, fresh: dict):
+    pd.testing.assert_frame_equal(patched["sheets"]["ACCOUNT"], fresh["sheets"]["ACCOUNT"])
+    for indexes in ("indexes", "value_indexes"):
+        a, b = patched[indexes]["ACCOUNT"], fresh[indexes]["ACCOUNT"]
+        if indexes == "indexes":
+            a, b = a["Account"], b["Account"]
+        assert a.keys() == b.keys()
+        for key in a:
+            np.testing.assert_array_equal(a[key], b[key])
+
+OLD = [("A1", "C1", "EUR"), ("A2", "C1", "USD"), ("A3", "C2", "EUR")]
+
+@pytest.mark.parametrize("new, mode", [
+    ([("A1", "C1", "EUR"), ("A2", "C1", "CHF"), ("A3", "C2", "EUR"), ("A4", "C1", "EUR")], "patch"),
+    ([("A1", "C1", "EUR"), ("A2", "C1", "USD"), ("A3", "C2", "EUR")], "patch"),
+    # nový riadok na začiatku a obrátené poradie -> záplata by poradie rozbila
+    ([("A0", "C1", "EUR"), ("A3", "C2", "EUR"), ("A2", "C1", "USD"), ("A1", "C1", "EUR")], "rebuild"),
+    ([("A1", "C1", "EUR"), ("A4", "C1", "EUR"), ("A2", "C1", "USD"), ("A3", "C2", "EUR")], "rebuild"),
+    ([("A1", "C1", "EUR"), ("A3", "C2", "EUR")], "rebuild"),
+])
+def test_patch_matches_fresh_load(new, mode):
+    patched, fresh = _refresh(_accounts(OLD), _accounts(new))
+    assert patched["changes"]["ACCOUNT"]["mode"] == mode
+    _assert_same(patched, fresh)
+    assert patched["previous"] == {}  # staré rámce sa po refreshi nedržia
+
+def test_query_order_after_reorder():
+    new = [("A0", "C1", "EUR"), ("A3", "C2", "EUR"), ("A2", "C1", "USD"), ("A1", "C1", "EUR")]
+    patched, fresh = _refresh(_accounts(OLD), _accounts(new))
+    rows = lambda wb: list(engine.run_query("ACCOUNT C1", wb)["rows"]["Account"])
+    assert rows(patched) == rows(fresh) == ["A0", "A2", "A1"]
@@ -0,0 +1,74 @@
+# --- SINGLE-FLIGHT AJ PRI CHYBE: súbežné studené načítania nedostupného zdroja = jeden GET na upstream ---
+import json, threading, time
+import engine
+
+def _source(monkeypatch, name: str, url: str) -> dict:
+    state = engine._new_source_state(name, url, float("inf"), "")
+    monkeypatch.setitem(engine._sources, name, state)
+    return state
+
+def _concurrent(n: int, fn) -> list:
+    results, barrier = [None] * n, threading.Barrier(n)
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=30)
+    return results
+
+def test_failed_cold_load_is_fetched_once(monkeypatch, stub):
+    stub.update(status=500, delay=0.3, body=b"down")
+    _source(monkeypatch, "dead", stub["url"])
+    results = _concurrent(6, lambda: engine.load_workbooks(["dead"])["dead"])
+    assert results == [None] * 6
+    assert stub["hits"] == 1
+
+def test_queued_load_excel_callers_reraise(monkeypatch, stub):
+    # priame volania (sheet export v app/API) čakajú na refresh_lock a po zlyhaní len zopakujú chybu
+    stub.update(status=500, delay=0.3, body=b"down")
+    _source(monkeypatch, "dead", stub["url"])
+
+    def call():
+        try:
+            engine.load_excel("dead")
+        except IOError as exc:
+            return exc
+    errors = _concurrent(6, call)
+    assert all(isinstance(exc, IOError) for exc in errors)
+    assert stub["hits"] == 1
+
+def test_failed_source_backs_off_then_retries(monkeypatch, stub):
+    stub.update(status=500, body=b"down")
+    state = _source(monkeypatch, "dead", stub["url"])
+    assert engine.load_workbooks(["dead"]) == {"dead": None}
+    t0 = time.perf_counter()
+    assert engine.load_workbooks(["dead"]) == {"dead": None}  # v backoffe: bez GET a hneď
+    assert stub["hits"] == 1 and time.perf_counter() - t0 < 0.1
+    # po okne (1 s pri prvom zlyhaní) sa skúsi znova a úspech sériu vynuluje
+    stub.update(status=200, body=json.dumps({"STATUS": [{"Reference": "R1", "Status": "OK"}]}).encode("utf-8"))
+    time.sleep(1.05)
+    assert engine.load_workbooks(["dead"])["dead"] is not None
+    assert stub["hits"] == 2 and state["fail_streak"] == 0
+
+def test_dead_source_does_not_block_healthy_cold_load(monkeypatch, stub):
+    # volajúci čakajúci na zlyhávajúci zdroj zdieľajú jeden future, takže zdravý studený zdroj dostane miesto v poole
+    stub.update(status=500, delay=1.0, body=b"down")
+    stub["routes"]["/ok.json"] = {"status": 200, "delay": 0.0,
+                                   "body": json.dumps({"STATUS": [{"Reference": "R1", "Status": "OK"}]}).encode("utf-8")}
+    _source(monkeypatch, "dead", stub["url"])
+    _source(monkeypatch, "ok", stub["url"].replace("x.json", "ok.json"))
+    threads = [threading.Thread(target=engine.load_workbooks, args=(["dead"],))
+               for _ in range(engine.SOURCE_FETCH_WORKERS * 2)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    t0 = time.perf_counter()
+    assert engine.load_workbooks(["ok"])["ok"] is not None
+    assert time.perf_counter() - t0 < 0.5
+    for t in threads:
+        t.join(timeout=30)
+    assert stub["hits"] == 2  # jeden GET pre "dead", jeden pre "ok"
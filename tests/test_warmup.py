@@ -0,0 +1,21 @@
+# --- WARMUP: chyba pri zahrievaní indexov nezhodí načítaný zdroj ani /ready ---
+import json, threading
+import engine
+
+def test_warm_error_does_not_fail_warmup(monkeypatch, stub):
+    stub.update(body=json.dumps({"STATUS": [{"Reference": "R1", "Status": "OK"}]}).encode("utf-8"))
+    state = engine._new_source_state("ok", stub["url"], float("inf"), "")
+    monkeypatch.setattr(engine, "_sources", {"ok": state})
+    monkeypatch.setattr(engine, "_warmup", {"lock": threading.Lock(), "state": "running", "started_at": 0.0,
+                                            "seconds": None, "attempts": 0})
+
+    def broken(wb):
+        raise RuntimeError("join failed")
+    monkeypatch.setattr(engine, "_client_view", broken)
+    runner = threading.Thread(target=engine._run_warmup, daemon=True)  # pri "failed" by sa opakoval donekonečna
+    runner.start()
+    runner.join(timeout=10)
+    assert not runner.is_alive()
+    assert engine._warmup["state"] == "done" and engine._warmup["attempts"] == 1
+    assert engine.warmup()["ok"] is state["workbook"]
+    assert stub["hits"] == 1